@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import datetime as dt
 import matplotlib.pyplot as plt
@@ -9,6 +10,9 @@ df_images = pd.read_csv("dataframes/df_images.csv")
 df_additional_data = pd.read_csv("dataframes/df_additional_data.csv")
 df_alt_az = pd.read_csv("dataframes/df_alt_az.csv")
 
+# Forces matrix (force distributions x actuators), mapped from disk without loading it
+forces_matrix = np.load("dataframes/forces.npy", mmap_mode="r")
+
 #Plotting the dataframes
 # Alt and Az plots
 df_alt = df_alt_az[(df_alt_az["type"] == "float") & (df_alt_az["group"] == "ALT")]
@@ -33,15 +37,9 @@ for pndex in range(n_partitions):
     fig, axes = plt.subplots(nrows=n_rows, figsize=(102.4, 51.2))
 
     for index in range(n_rows):
-        value_list = []
-
         fndex = index + (n_rows * n_cols * pndex)
 
-        for dist in df_f_dist["forces"]:
-            value = float(dist.strip("[").strip("]").split(", ")[fndex])
-            value_list.append(value)
-
-        df_f_act_list[fndex]["value"] = value_list
+        df_f_act_list[fndex]["value"] = forces_matrix[df_f_dist["forces_row"].to_numpy(), fndex]
 
         f_plot = df_f_act_list[fndex].plot(x="timestamp", y="value", ax=axes[index], title="Actuator {0} plot".format(fndex))
 
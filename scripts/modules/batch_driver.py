@@ -0,0 +1,168 @@
+import time
+import os
+import json
+import logging
+import argparse
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+from modules.obs_prefetcher import ObsPrefetcher
+
+
+"""
+Global variables:
+    tracking_time: Initialization of time for checkpoint monitoring
+"""
+tracking_time = time.time()
+
+
+def batch_driver(
+    logger: logging.Logger, args: argparse.Namespace, process_job: Callable[[logging.Logger, argparse.Namespace], dict]
+) -> list[dict]:
+    """Runs the processing path for every night of a date range and every UT telescope of a list, scheduling the (night, UT) jobs
+    across a pool of worker processes. The observation file of each night is fetched a single time, in the background and with a
+    bounded number of concurrent requests, and shared between it's UT telescopes, whose jobs are scheduled as soon as it's fetched
+
+    Args:
+        logger: Current script logging object
+        args: Namespace with the defined arguments and optional flags, with the first night as date, the last one as enddate and the
+            UT telescopes separated by commas
+        process_job: Processing path of a single night and UT telescope, which returns a summary of the run
+
+    Returns:
+        A list of dictionaries, with the summary (or the error) of each job, in the order of the nights and UT telescopes
+    """
+
+    global tracking_time
+
+    ### Checkpoint - Start batch
+    logger.info("Start batch: {0}".format(str(time.time() - tracking_time)))
+    tracking_time = time.time()
+
+    batch_start = time.time()
+
+    first_night = date.fromisoformat(args.date)
+    last_night = date.fromisoformat(args.enddate) if args.enddate else first_night
+
+    if last_night < first_night:
+        raise ValueError("The end date {0} is before the date {1}".format(args.enddate, args.date))
+
+    nights = [
+        (first_night + timedelta(days=day)).isoformat() for day in range((last_night - first_night).days + 1)
+    ]
+    uts = [ut.strip() for ut in args.ut.split(",") if ut.strip() != ""]
+
+    batch_folder = args.outputfolder if args.outputfolder else "../files/batch"
+
+    #### Observation files, fetched once by night in the background, while the jobs of the nights already fetched run
+    obs_prefetcher = None
+
+    if args.obsprocess and args.fetchobs:
+        obs_prefetcher = ObsPrefetcher(
+            logger,
+            "../files/obs_files",
+            nights,
+            max_workers=args.fetchconcurrency,
+            profile=args.queryprofile,
+            url=args.archiveurl,
+            max_age=args.obsmaxage,
+            offline=args.offline,
+        )
+
+    #### Arguments of each job, with it's own output folders, by night
+    jobs_args = {}
+
+    for night in nights:
+        jobs_args[night] = []
+
+        for ut in uts:
+            job_args = argparse.Namespace(**vars(args))
+            job_args.date = night
+            job_args.ut = ut
+            job_args.enddate = None
+            job_args.fetchobs = False
+            job_args.outputfolder = "{0}/{1}_wt{2}".format(batch_folder, night, ut)
+
+            os.makedirs(job_args.outputfolder, exist_ok=True)
+
+            if args.save:
+                job_args.save = "{0}/{1}_wt{2}".format(args.save, night, ut)
+                os.makedirs(job_args.save, exist_ok=True)
+
+            jobs_args[night].append(job_args)
+
+    #### Jobs, run in the worker pool (or one after another if there is a single worker). The jobs of each night start as soon as
+    #### it's observation file is fetched
+    job_summaries = []
+    job_futures = []
+
+    executor = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 else None
+
+    try:
+        for night in nights:
+            if obs_prefetcher is not None:
+                try:
+                    obs_prefetcher.result(night)
+
+                except Exception as error:
+                    logger.info("Fetch {0} failed: {1}".format(night, repr(error)))
+
+            for job_args in jobs_args[night]:
+                if executor is not None:
+                    job_futures.append((job_args, executor.submit(process_job, logger, job_args)))
+                    continue
+
+                try:
+                    job_summaries.append(dict(process_job(logger, job_args), status="ok"))
+
+                except Exception as error:
+                    job_summaries.append(
+                        {"date": job_args.date, "ut": job_args.ut, "status": "error", "error": repr(error)}
+                    )
+
+        for job_args, job_future in job_futures:
+            try:
+                job_summaries.append(dict(job_future.result(), status="ok"))
+
+            except Exception as error:
+                job_summaries.append({"date": job_args.date, "ut": job_args.ut, "status": "error", "error": repr(error)})
+
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+        if obs_prefetcher is not None:
+            obs_prefetcher.close()
+
+    fetch_times = {}
+
+    if obs_prefetcher is not None:
+        fetch_times = {night: obs_prefetcher.fetch_times[night] for night in nights if night in obs_prefetcher.fetch_times}
+
+    for job_summary in job_summaries:
+        if job_summary["status"] == "error":
+            logger.info(
+                "Job {0} UT{1} failed: {2}".format(job_summary["date"], job_summary["ut"], job_summary["error"])
+            )
+
+    #### Manifest of the outputs and timings of the batch
+    manifest = {
+        "nights": nights,
+        "uts": uts,
+        "jobs": args.jobs,
+        "fetch_times": fetch_times,
+        "total_time": time.time() - batch_start,
+        "runs": job_summaries,
+    }
+
+    with open("{0}/manifest_{1}_{2}.json".format(batch_folder, nights[0], nights[-1]), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+
+    ### Checkpoint - End batch
+    logger.info(
+        "End batch: {0} - Jobs run: {1}".format(str(time.time() - tracking_time), str(len(job_summaries)))
+    )
+    tracking_time = time.time()
+
+    return job_summaries
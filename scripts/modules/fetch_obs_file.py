@@ -1,203 +1,348 @@
 from io import StringIO
+from datetime import date
+import time
+import calendar
+import os
 import csv
+import json
+import shutil
+import hashlib
+import logging
 import requests
 
-def fetch_obs_file(destination_folder, obs_date) -> int:
-    """Fetch the VLT Observations CSV file from the ESO raw database and saves it in the obs_files folder
-    
+from modules.open_obs_file import open_obs_file, project_obs_rows
+
+
+"""
+Global variables:
+    archive_url: Query URL of the ESO raw database
+    cache_max_age: Seconds that a cached observation file of a recent night is used before it's fetched again
+    settled_days: Days after a night when it's observations are complete in the archive, so it's cached file never expires
+    full_query: Fields of the archive query form, without the night, that ask for every output column of the observations
+    interval_columns: Output columns of the archive query form that the observation time blocks are built from
+    query_profiles: Fields of the archive query form of each profile, with the same observations selected: full asks for every
+        output column, and intervals only for the interval_columns
+"""
+archive_url = "https://archive.eso.org/wdb/wdb/eso/eso_archive_main/query"
+
+cache_max_age = 3600.0
+
+settled_days = 3
+
+full_query = {
+    "wdbo": (None, "csv/download"),
+    "max_rows_returned": (None, "999999"),
+    "instrument": (None, ""),
+    "tab_object": (None, "on"),
+    "target": (None, ""),
+    "resolver": (None, "simbad"),
+    "ra": (None, ""),
+    "dec": (None, ""),
+    "box": (None, "00 10 00"),
+    "degrees_or_hours": (None, "hours"),
+    "tab_target_coord": (None, "on"),
+    "format": (None, "SexaHour"),
+    "wdb_input_file": (None, ""),
+    "stime": (None, ""),
+    "starttime": (None, "12"),
+    "etime": (None, ""),
+    "endtime": (None, "12"),
+    "tab_prog_id": (None, "on"),
+    "prog_id": (None, ""),
+    "gto": (None, ""),
+    "pi_coi": (None, ""),
+    "obs_mode": (None, ""),
+    "title": (None, ""),
+    "image[]": (None, "EFOSC;'IMA%'"),
+    "image[]": (None, "EMMI;'IMA%'"),
+    "image[]": (None, "ERIS"),
+    "image[]": (None, "FORS1;'IMA%'"),
+    "image[]": (None, "FORS2;'IMA%'"),
+    "image[]": (None, "HAWKI;'IMA%'"),
+    "image[]": (None, "GROND"),
+    "image[]": (None, "ISAAC;'IMA%'"),
+    "image[]": (None, "NAOS+CONICA;'IMA%','SDI%'"),
+    "image[]": (None, "OMEGACAM"),
+    "image[]": (None, "SOFI;'IMA%'"),
+    "image[]": (None, "SPHERE;'IMA%'"),
+    "image[]": (None, "SUSI"),
+    "image[]": (None, "TIMMI;'IMA%'"),
+    "image[]": (None, "VIMOS;'IMA%'"),
+    "image[]": (None, "VIRCAM"),
+    "image[]": (None, "VISIR;'IMA%'"),
+    "image[]": (None, "WFI"),
+    "image[]": (None, "XSHOOTER;'IMA%'"),
+    "spectrum[]": (None, "CES"),
+    "spectrum[]": (None, "CRIRE;'SPECTRUM%'"),
+    "spectrum[]": (None, "EFOSC;'SPECTRUM%'"),
+    "spectrum[]": (None, "EMMI;'SPECTRUM%','ECHELLE%','MOS%'"),
+    "spectrum[]": (None, "ERIS;'IFU%','%LSS%'"),
+    "spectrum[]": (None, "ESPRESSO"),
+    "spectrum[]": (None, "FEROS"),
+    "spectrum[]": (None, "FORS1;'SPECTRUM%','MOS%','IMAGE_SPECTRUM%'"),
+    "spectrum[]": (
+        None,
+        "FORS2;'SPECTRUM%','ECHELLE%','MOS%','MXU%','HIT%','IMAGE_SPECTRUM%'",
+    ),
+    "spectrum[]": (None, "GIRAF"),
+    "spectrum[]": (None, "HARPS"),
+    "spectrum[]": (None, "ISAAC;'SPECTRUM%'"),
+    "spectrum[]": (None, "KMOS"),
+    "spectrum[]": (None, "MUSE"),
+    "spectrum[]": (None, "NAOS+CONICA;'SPECTRUM%'"),
+    "spectrum[]": (None, "NIRPS"),
+    "spectrum[]": (None, "SINFO"),
+    "spectrum[]": (None, "SOFI;'SPECTRUM%'"),
+    "spectrum[]": (None, "SPHERE;'IFU%','SPECTRUM%'"),
+    "spectrum[]": (None, "TIMMI;'SPECTRUM%'"),
+    "spectrum[]": (None, "UVES"),
+    "spectrum[]": (None, "VIMOS;'IFU%','MOS%'"),
+    "spectrum[]": (None, "VISIR;'SPECTRUM%','ECHELLE%'"),
+    "spectrum[]": (None, "SHOOT"),
+    "vlti[]": (None, "AMBER"),
+    "vlti[]": (None, "GRAVITY"),
+    "vlti[]": (None, "MATISSE"),
+    "vlti[]": (None, "MIDI"),
+    "vlti[]": (None, "PIONIER"),
+    "vlti[]": (None, "VINCI"),
+    "polarim[]": (None, "EFOSC;'POLARIM%'"),
+    "polarim[]": (None, "FORS1;'POLARIM%'"),
+    "polarim[]": (None, "FORS2;'POLARIM%'"),
+    "polarim[]": (None, "ISAAC;'POLARIM%'"),
+    "polarim[]": (None, "NAOS+CONICA;'POLARIM%'"),
+    "polarim[]": (None, "SOFI;'POLARIM%'"),
+    "polarim[]": (None, "SPHERE;'POLARIM%'"),
+    "corono[]": (None, "EFOSC;'%CORO%'"),
+    "corono[]": (None, "ERIS;'CORO%'"),
+    "corono[]": (None, "NAOS+CONICA;'%CORO%'"),
+    "corono[]": (None, "SPHERE;'%CORO%'"),
+    "corono[]": (None, "VISIR;'%CORO%'"),
+    "other[]": (None, "ALPACA"),
+    "other[]": (None, "APICAM"),
+    "other[]": (None, "APEXBOL"),
+    "other[]": (None, "APEXHET"),
+    "other[]": (None, "FAIM6"),
+    "other[]": (None, "FAIM7"),
+    "other[]": (None, "GRIPS19"),
+    "other[]": (None, "LGSF"),
+    "other[]": (None, "MAD"),
+    "other[]": (None, "MASCOT"),
+    "other[]": (None, "SPECU"),
+    "other[]": (None, "WFCAM"),
+    "sam[]": (None, "ERIS;'%SAM%'"),
+    "sam[]": (None, "NAOS+CONICA;'%SAM%'"),
+    "sam[]": (None, "SPHERE;'%SAM%'"),
+    "sam[]": (None, "VISIR;'SAM%'"),
+    "tab_dp_cat": (None, "on"),
+    "dp_cat": (None, "SCIENCE"),
+    "dp_cat": (None, "ACQUISITION"),
+    "tab_dp_type": (None, "on"),
+    "dp_type": (None, ""),
+    "dp_type_user": (None, ""),
+    "tab_dp_tech": (None, "on"),
+    "dp_tech": (None, ""),
+    "dp_tech_user": (None, ""),
+    "tab_dp_id": (None, "on"),
+    "dp_id": (None, ""),
+    "origfile": (None, ""),
+    "tab_rel_date": (None, "on"),
+    "rel_date": (None, ""),
+    "obs_name": (None, ""),
+    "ob_id": (None, ""),
+    "tab_tpl_start": (None, "on"),
+    "tpl_start": (None, ""),
+    "tab_tpl_id": (None, "on"),
+    "tpl_id": (None, ""),
+    "tab_exptime": (None, "on"),
+    "exptime": (None, ""),
+    "tab_filter_path": (None, "on"),
+    "filter_path": (None, ""),
+    "tab_wavelength_input": (None, "on"),
+    "wavelength_input": (None, ""),
+    "tab_fwhm_input": (None, "on"),
+    "fwhm_input": (None, ""),
+    "gris_path": (None, ""),
+    "grat_path": (None, ""),
+    "slit_path": (None, ""),
+    "tab_instrument": (None, "on"),
+    "add": (
+        None,
+        "((ins_id like 'EFOSC%' AND (dp_tech like 'IMA%')) or (ins_id like 'EMMI%' AND (dp_tech like 'IMA%')) or (ins_id like 'ERIS%') or (ins_id like ('ERIS%') AND ((dp_tech like 'IMA%') AND (dp_tech not like '%SAM%'))) or (ins_id like 'FORS1%' AND (dp_tech like 'IMA%')) or (ins_id like 'FORS2%' AND (dp_tech like 'IMA%')) or (ins_id like 'HAWKI%' AND (dp_tech like 'IMA%')) or (ins_id like 'GROND%') or (ins_id like 'ISAAC%' AND (dp_tech like 'IMA%')) or (ins_id like 'NAOS+CONICA%' AND (dp_tech like 'IMA%' OR dp_tech like 'SDI%')) or (ins_id like 'OMEGACAM%') or (ins_id like 'SOFI%' AND (dp_tech like 'IMA%')) or (ins_id like 'SPHERE%' AND (dp_tech like 'IMA%')) or (ins_id like 'SUSI%') or (ins_id like 'TIMMI%' AND (dp_tech like 'IMA%')) or (ins_id like 'VIMOS%' AND (dp_tech like 'IMA%')) or (ins_id like 'VIRCAM%') or (ins_id like 'VISIR%' AND (dp_tech like 'IMA%')) or (ins_id like 'WFI%') or (ins_id like 'XSHOOTER%' AND (dp_tech like 'IMA%')) or (ins_id like 'CES%') or (ins_id like 'CRIRE%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'EFOSC%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'EMMI%' AND ((dp_tech like 'SPECTRUM%' OR dp_tech like 'ECHELLE%' OR dp_tech like 'MOS%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'ERIS%' AND ((dp_tech like 'IFU%' OR dp_tech like '%LSS%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'ESPRESSO%') or (ins_id like 'FEROS%') or (ins_id like 'FORS1%' AND ((dp_tech like 'SPECTRUM%' OR dp_tech like 'MOS%' OR dp_tech like 'IMAGE_SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'FORS2%' AND ((dp_tech like 'SPECTRUM%' OR dp_tech like 'ECHELLE%' OR dp_tech like 'MOS%' OR dp_tech like 'MXU%' OR dp_tech like 'HIT%' OR dp_tech like 'IMAGE_SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'GIRAF%') or (ins_id like 'HARPS%') or (ins_id like 'ISAAC%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'KMOS%') or (ins_id like 'MUSE%') or (ins_id like 'NAOS+CONICA%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'NIRPS%') or (ins_id like 'SINFO%') or (ins_id like 'SOFI%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'SPHERE%' AND ((dp_tech like 'IFU%' OR dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'TIMMI%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'UVES%') or (ins_id like 'VIMOS%' AND ((dp_tech like 'IFU%' OR dp_tech like 'MOS%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'VISIR%' AND ((dp_tech like 'SPECTRUM%' OR dp_tech like 'ECHELLE%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'SHOOT%') or (ins_id in ('SHOOT','XSHOOTER') AND ((dp_tech like 'ECHELLE%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'AMBER%') or (ins_id like 'GRAVITY%') or (ins_id like 'MATISSE%') or (ins_id like 'MIDI%') or (ins_id like 'PIONIER%') or (ins_id like 'VINCI%') or (ins_id like 'EFOSC%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'FORS1%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'FORS2%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'ISAAC%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'NAOS+CONICA%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'SOFI%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'SPHERE%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'EFOSC%' AND (dp_tech like '%CORO%')) or (ins_id like 'ERIS%' AND (dp_tech like 'CORO%')) or (ins_id like 'NAOS+CONICA%' AND (dp_tech like '%CORO%')) or (ins_id like 'SPHERE%' AND (dp_tech like '%CORO%')) or (ins_id like 'VISIR%' AND (dp_tech like '%CORO%')) or (ins_id like 'ALPACA%') or (ins_id like 'APICAM%') or (ins_id like 'APEXBOL%') or (ins_id like 'APEXHET%') or (ins_id like 'FAIM6%') or (ins_id like 'FAIM7%') or (ins_id like 'GRIPS19%') or (ins_id like 'LGSF%') or (ins_id like 'MAD%') or (ins_id like 'MASCOT%') or (ins_id like 'SPECU%') or (ins_id like 'WFCAM%') or (ins_id like 'ERIS%' AND (dp_tech like '%SAM%')) or (ins_id like 'NAOS+CONICA%' AND (dp_tech like '%SAM%')) or (ins_id like 'SPHERE%' AND (dp_tech like '%SAM%')) or (ins_id like 'VISIR%' AND (dp_tech like 'SAM%')))",
+    ),
+    "tab_tel_airm_start": (None, "on"),
+    "tab_stat_instrument": (None, "on"),
+    "tab_ambient": (None, "on"),
+    "tab_stat_exptime": (None, "on"),
+    "tab_HDR": (None, "on"),
+    "tab_mjd_obs": (None, "on"),
+    "aladin_colour": (None, "aladin_instrument"),
+    "tab_stat_plot": (None, "on"),
+    "order": (None, ""),
+}
+
+interval_columns = ["tab_tpl_id", "tab_tpl_start", "tab_exptime"]
+
+query_profiles = {
+    "full": full_query,
+    "intervals": {
+        field_name: field_value
+        for field_name, field_value in full_query.items()
+        if not field_name.startswith("tab_") or field_name in interval_columns
+    },
+}
+
+
+def fetch_obs_file(
+    logger: logging.Logger,
+    destination_folder: str,
+    obs_date: str,
+    profile: str = "intervals",
+    url: str = archive_url,
+    max_age: float = cache_max_age,
+    offline: bool = False,
+    session: requests.Session = None,
+) -> list[any]:
+    """Fetch the VLT Observations CSV file from the ESO raw database and saves it in the obs_files folder. Each response is kept in a
+    content addressed cache (files named by the hash of their content, found by the hash of the night and query), so a night is
+    fetched again only when it's cached file is not fresh: a night is fresh for good when it was fetched after it had settled, and
+    for max_age seconds otherwise. The response is streamed line by line into the cached file and into the projection of it's rows
+    on the observation time block fields, in a single pass
+
     Args:
+        logger: Current script logging object
         destination_folder: Relative path of the folder where the fetched CSV file is stored.
         obs_date: Date of the CSV file to be fetched.
+        profile: Query profile, as in query_profiles, where intervals asks only for the columns of the observation time blocks
+        url: Query URL of the archive (either the ESO one or a local stand-in)
+        max_age: Seconds that a cached file of a recent night is used (0 fetches recent nights always)
+        offline: Flag for the use of the cached files only, even if they are not fresh, without any request to the archive
+        session: Session whose pooled connections are reused for the request (a new connection is made if None)
 
     Returns:
-        Status code of the fetch
+        List with the status code of the fetch (200 if the cached file is used, 503 if the archive can't be reached, and 504 if
+        there is no cached file in offline mode), followed by a list of lists with the observation instrument, timestamp and
+        exptime of each observation (None if neither the archive nor the cache have the file)
     """
 
-    url = "https://archive.eso.org/wdb/wdb/eso/eso_archive_main/query"
+    cache_folder = "{0}/cache".format(destination_folder)
+    os.makedirs("{0}/keys".format(cache_folder), exist_ok=True)
+    os.makedirs("{0}/objects".format(cache_folder), exist_ok=True)
 
     header = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:142.0) Gecko/20100101 Firefox/142.0",
         "Referer": "https://archive.eso.org/eso/eso_archive_main.html",
     }
 
-    payload = {
-        "wdbo": (None, "csv/download"),
-        "max_rows_returned": (None, "999999"),
-        "instrument": (None, ""),
-        "tab_object": (None, "on"),
-        "target": (None, ""),
-        "resolver": (None, "simbad"),
-        "ra": (None, ""),
-        "dec": (None, ""),
-        "box": (None, "00 10 00"),
-        "degrees_or_hours": (None, "hours"),
-        "tab_target_coord": (None, "on"),
-        "format": (None, "SexaHour"),
-        "wdb_input_file": (None, ""),
-        "night": (None, obs_date),
-        "stime": (None, ""),
-        "starttime": (None, "12"),
-        "etime": (None, ""),
-        "endtime": (None, "12"),
-        "tab_prog_id": (None, "on"),
-        "prog_id": (None, ""),
-        "gto": (None, ""),
-        "pi_coi": (None, ""),
-        "obs_mode": (None, ""),
-        "title": (None, ""),
-        "image[]": (None, "EFOSC;'IMA%'"),
-        "image[]": (None, "EMMI;'IMA%'"),
-        "image[]": (None, "ERIS"),
-        "image[]": (None, "FORS1;'IMA%'"),
-        "image[]": (None, "FORS2;'IMA%'"),
-        "image[]": (None, "HAWKI;'IMA%'"),
-        "image[]": (None, "GROND"),
-        "image[]": (None, "ISAAC;'IMA%'"),
-        "image[]": (None, "NAOS+CONICA;'IMA%','SDI%'"),
-        "image[]": (None, "OMEGACAM"),
-        "image[]": (None, "SOFI;'IMA%'"),
-        "image[]": (None, "SPHERE;'IMA%'"),
-        "image[]": (None, "SUSI"),
-        "image[]": (None, "TIMMI;'IMA%'"),
-        "image[]": (None, "VIMOS;'IMA%'"),
-        "image[]": (None, "VIRCAM"),
-        "image[]": (None, "VISIR;'IMA%'"),
-        "image[]": (None, "WFI"),
-        "image[]": (None, "XSHOOTER;'IMA%'"),
-        "spectrum[]": (None, "CES"),
-        "spectrum[]": (None, "CRIRE;'SPECTRUM%'"),
-        "spectrum[]": (None, "EFOSC;'SPECTRUM%'"),
-        "spectrum[]": (None, "EMMI;'SPECTRUM%','ECHELLE%','MOS%'"),
-        "spectrum[]": (None, "ERIS;'IFU%','%LSS%'"),
-        "spectrum[]": (None, "ESPRESSO"),
-        "spectrum[]": (None, "FEROS"),
-        "spectrum[]": (None, "FORS1;'SPECTRUM%','MOS%','IMAGE_SPECTRUM%'"),
-        "spectrum[]": (
-            None,
-            "FORS2;'SPECTRUM%','ECHELLE%','MOS%','MXU%','HIT%','IMAGE_SPECTRUM%'",
-        ),
-        "spectrum[]": (None, "GIRAF"),
-        "spectrum[]": (None, "HARPS"),
-        "spectrum[]": (None, "ISAAC;'SPECTRUM%'"),
-        "spectrum[]": (None, "KMOS"),
-        "spectrum[]": (None, "MUSE"),
-        "spectrum[]": (None, "NAOS+CONICA;'SPECTRUM%'"),
-        "spectrum[]": (None, "NIRPS"),
-        "spectrum[]": (None, "SINFO"),
-        "spectrum[]": (None, "SOFI;'SPECTRUM%'"),
-        "spectrum[]": (None, "SPHERE;'IFU%','SPECTRUM%'"),
-        "spectrum[]": (None, "TIMMI;'SPECTRUM%'"),
-        "spectrum[]": (None, "UVES"),
-        "spectrum[]": (None, "VIMOS;'IFU%','MOS%'"),
-        "spectrum[]": (None, "VISIR;'SPECTRUM%','ECHELLE%'"),
-        "spectrum[]": (None, "SHOOT"),
-        "vlti[]": (None, "AMBER"),
-        "vlti[]": (None, "GRAVITY"),
-        "vlti[]": (None, "MATISSE"),
-        "vlti[]": (None, "MIDI"),
-        "vlti[]": (None, "PIONIER"),
-        "vlti[]": (None, "VINCI"),
-        "polarim[]": (None, "EFOSC;'POLARIM%'"),
-        "polarim[]": (None, "FORS1;'POLARIM%'"),
-        "polarim[]": (None, "FORS2;'POLARIM%'"),
-        "polarim[]": (None, "ISAAC;'POLARIM%'"),
-        "polarim[]": (None, "NAOS+CONICA;'POLARIM%'"),
-        "polarim[]": (None, "SOFI;'POLARIM%'"),
-        "polarim[]": (None, "SPHERE;'POLARIM%'"),
-        "corono[]": (None, "EFOSC;'%CORO%'"),
-        "corono[]": (None, "ERIS;'CORO%'"),
-        "corono[]": (None, "NAOS+CONICA;'%CORO%'"),
-        "corono[]": (None, "SPHERE;'%CORO%'"),
-        "corono[]": (None, "VISIR;'%CORO%'"),
-        "other[]": (None, "ALPACA"),
-        "other[]": (None, "APICAM"),
-        "other[]": (None, "APEXBOL"),
-        "other[]": (None, "APEXHET"),
-        "other[]": (None, "FAIM6"),
-        "other[]": (None, "FAIM7"),
-        "other[]": (None, "GRIPS19"),
-        "other[]": (None, "LGSF"),
-        "other[]": (None, "MAD"),
-        "other[]": (None, "MASCOT"),
-        "other[]": (None, "SPECU"),
-        "other[]": (None, "WFCAM"),
-        "sam[]": (None, "ERIS;'%SAM%'"),
-        "sam[]": (None, "NAOS+CONICA;'%SAM%'"),
-        "sam[]": (None, "SPHERE;'%SAM%'"),
-        "sam[]": (None, "VISIR;'SAM%'"),
-        "tab_dp_cat": (None, "on"),
-        "dp_cat": (None, "SCIENCE"),
-        "dp_cat": (None, "ACQUISITION"),
-        "tab_dp_type": (None, "on"),
-        "dp_type": (None, ""),
-        "dp_type_user": (None, ""),
-        "tab_dp_tech": (None, "on"),
-        "dp_tech": (None, ""),
-        "dp_tech_user": (None, ""),
-        "tab_dp_id": (None, "on"),
-        "dp_id": (None, ""),
-        "origfile": (None, ""),
-        "tab_rel_date": (None, "on"),
-        "rel_date": (None, ""),
-        "obs_name": (None, ""),
-        "ob_id": (None, ""),
-        "tab_tpl_start": (None, "on"),
-        "tpl_start": (None, ""),
-        "tab_tpl_id": (None, "on"),
-        "tpl_id": (None, ""),
-        "tab_exptime": (None, "on"),
-        "exptime": (None, ""),
-        "tab_filter_path": (None, "on"),
-        "filter_path": (None, ""),
-        "tab_wavelength_input": (None, "on"),
-        "wavelength_input": (None, ""),
-        "tab_fwhm_input": (None, "on"),
-        "fwhm_input": (None, ""),
-        "gris_path": (None, ""),
-        "grat_path": (None, ""),
-        "slit_path": (None, ""),
-        "tab_instrument": (None, "on"),
-        "add": (
-            None,
-            "((ins_id like 'EFOSC%' AND (dp_tech like 'IMA%')) or (ins_id like 'EMMI%' AND (dp_tech like 'IMA%')) or (ins_id like 'ERIS%') or (ins_id like ('ERIS%') AND ((dp_tech like 'IMA%') AND (dp_tech not like '%SAM%'))) or (ins_id like 'FORS1%' AND (dp_tech like 'IMA%')) or (ins_id like 'FORS2%' AND (dp_tech like 'IMA%')) or (ins_id like 'HAWKI%' AND (dp_tech like 'IMA%')) or (ins_id like 'GROND%') or (ins_id like 'ISAAC%' AND (dp_tech like 'IMA%')) or (ins_id like 'NAOS+CONICA%' AND (dp_tech like 'IMA%' OR dp_tech like 'SDI%')) or (ins_id like 'OMEGACAM%') or (ins_id like 'SOFI%' AND (dp_tech like 'IMA%')) or (ins_id like 'SPHERE%' AND (dp_tech like 'IMA%')) or (ins_id like 'SUSI%') or (ins_id like 'TIMMI%' AND (dp_tech like 'IMA%')) or (ins_id like 'VIMOS%' AND (dp_tech like 'IMA%')) or (ins_id like 'VIRCAM%') or (ins_id like 'VISIR%' AND (dp_tech like 'IMA%')) or (ins_id like 'WFI%') or (ins_id like 'XSHOOTER%' AND (dp_tech like 'IMA%')) or (ins_id like 'CES%') or (ins_id like 'CRIRE%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'EFOSC%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'EMMI%' AND ((dp_tech like 'SPECTRUM%' OR dp_tech like 'ECHELLE%' OR dp_tech like 'MOS%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'ERIS%' AND ((dp_tech like 'IFU%' OR dp_tech like '%LSS%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'ESPRESSO%') or (ins_id like 'FEROS%') or (ins_id like 'FORS1%' AND ((dp_tech like 'SPECTRUM%' OR dp_tech like 'MOS%' OR dp_tech like 'IMAGE_SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'FORS2%' AND ((dp_tech like 'SPECTRUM%' OR dp_tech like 'ECHELLE%' OR dp_tech like 'MOS%' OR dp_tech like 'MXU%' OR dp_tech like 'HIT%' OR dp_tech like 'IMAGE_SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'GIRAF%') or (ins_id like 'HARPS%') or (ins_id like 'ISAAC%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'KMOS%') or (ins_id like 'MUSE%') or (ins_id like 'NAOS+CONICA%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'NIRPS%') or (ins_id like 'SINFO%') or (ins_id like 'SOFI%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'SPHERE%' AND ((dp_tech like 'IFU%' OR dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'TIMMI%' AND ((dp_tech like 'SPECTRUM%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'UVES%') or (ins_id like 'VIMOS%' AND ((dp_tech like 'IFU%' OR dp_tech like 'MOS%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'VISIR%' AND ((dp_tech like 'SPECTRUM%' OR dp_tech like 'ECHELLE%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'SHOOT%') or (ins_id in ('SHOOT','XSHOOTER') AND ((dp_tech like 'ECHELLE%') OR (dp_cat != 'SCIENCE'))) or (ins_id like 'AMBER%') or (ins_id like 'GRAVITY%') or (ins_id like 'MATISSE%') or (ins_id like 'MIDI%') or (ins_id like 'PIONIER%') or (ins_id like 'VINCI%') or (ins_id like 'EFOSC%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'FORS1%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'FORS2%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'ISAAC%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'NAOS+CONICA%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'SOFI%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'SPHERE%' AND (dp_tech like 'POLARIM%')) or (ins_id like 'EFOSC%' AND (dp_tech like '%CORO%')) or (ins_id like 'ERIS%' AND (dp_tech like 'CORO%')) or (ins_id like 'NAOS+CONICA%' AND (dp_tech like '%CORO%')) or (ins_id like 'SPHERE%' AND (dp_tech like '%CORO%')) or (ins_id like 'VISIR%' AND (dp_tech like '%CORO%')) or (ins_id like 'ALPACA%') or (ins_id like 'APICAM%') or (ins_id like 'APEXBOL%') or (ins_id like 'APEXHET%') or (ins_id like 'FAIM6%') or (ins_id like 'FAIM7%') or (ins_id like 'GRIPS19%') or (ins_id like 'LGSF%') or (ins_id like 'MAD%') or (ins_id like 'MASCOT%') or (ins_id like 'SPECU%') or (ins_id like 'WFCAM%') or (ins_id like 'ERIS%' AND (dp_tech like '%SAM%')) or (ins_id like 'NAOS+CONICA%' AND (dp_tech like '%SAM%')) or (ins_id like 'SPHERE%' AND (dp_tech like '%SAM%')) or (ins_id like 'VISIR%' AND (dp_tech like 'SAM%')))",
-        ),
-        "tab_tel_airm_start": (None, "on"),
-        "tab_stat_instrument": (None, "on"),
-        "tab_ambient": (None, "on"),
-        "tab_stat_exptime": (None, "on"),
-        "tab_HDR": (None, "on"),
-        "tab_mjd_obs": (None, "on"),
-        "aladin_colour": (None, "aladin_instrument"),
-        "tab_stat_plot": (None, "on"),
-        "order": (None, ""),
-    }
+    # Fields of the query profile, with the night
+    payload = dict(query_profiles[profile], night=(None, obs_date))
+
+    #### Cache entry of the night and query
+    query_key = hashlib.sha256(
+        json.dumps({"night": obs_date, "profile": profile, "payload": sorted(payload.items())}).encode("utf-8")
+    ).hexdigest()
+    key_name = "{0}/keys/{1}.json".format(cache_folder, query_key)
+    obs_file_name = "{0}/{1}.csv".format(destination_folder, obs_date)
+
+    cache_entry = None
+
+    if os.path.exists(key_name):
+        with open(key_name) as key_file:
+            cache_entry = json.load(key_file)
+
+        if not os.path.exists("{0}/objects/{1}.csv".format(cache_folder, cache_entry["content"])):
+            cache_entry = None
+
+    if cache_entry is not None:
+        night_time = calendar.timegm(date.fromisoformat(obs_date).timetuple())
+        settled_flag = cache_entry["fetched"] - night_time > settled_days * 86400
+        fresh_flag = settled_flag or time.time() - cache_entry["fetched"] < max_age
+
+        if fresh_flag or offline:
+            shutil.copyfile("{0}/objects/{1}.csv".format(cache_folder, cache_entry["content"]), obs_file_name)
+
+            logger.info(
+                "Obs cache hit: {0} - {1}".format(obs_date, "fresh" if fresh_flag else "stale, offline")
+            )
+
+            return [200, open_obs_file(logger, obs_file_name)]
+
+    if offline:
+        logger.info("Obs cache miss: {0} - offline".format(obs_date))
+        print("No cached observation csv in offline mode ", obs_date)
+
+        return [504, None]
+
+    logger.info("Obs cache miss: {0} - {1}".format(obs_date, "stale" if cache_entry is not None else "absent"))
+
+    obs_list = None
+
+    try:
+        # Make a POST request with data, whose body is read as it arrives (the connection is released back to the pool on exit)
+        with (session if session is not None else requests).post(
+            url, files=payload, headers=header, stream=True
+        ) as response:
+            fetch_status = response.status_code
+
+            # Access the response body as CSV, one line at a time
+            if response.status_code == 200:
+                content_hash = hashlib.sha256()
+                part_name = "{0}/objects/{1}.part".format(cache_folder, query_key)
+
+                # A body without a charset in it's Content-Type is decoded as UTF-8, as it's cached file is written
+                response.encoding = response.encoding or "utf-8"
+
+                # Each row is written to the cached file (hashed on the way) before it's projected, so the body is never held
+                # whole
+                row_buffer = StringIO()
+                row_writer = csv.writer(row_buffer)
+
+                try:
+                    with open(part_name, "w", newline="") as part_file:
+
+                        def written_rows():
+                            for row in csv.reader(response.iter_lines(chunk_size=65536, decode_unicode=True)):
+                                if len(row) > 1:
+                                    row_writer.writerow(row)
+                                    part_file.write(row_buffer.getvalue())
+                                    content_hash.update(row_buffer.getvalue().encode("utf-8"))
+
+                                    row_buffer.seek(0)
+                                    row_buffer.truncate()
+
+                                    yield row
+
+                        obs_list = list(project_obs_rows(logger, written_rows()))
 
-    # Make a POST request with data
-    response = requests.post(url, files=payload, headers=header)
+                    # Cached file, named by it's content, and the entry that points to it
+                    content_key = content_hash.hexdigest()
+                    os.replace(part_name, "{0}/objects/{1}.csv".format(cache_folder, content_key))
 
-    # Access the response body as CSV
-    if response.status_code == 200:
-        obs_csv_list = []
+                finally:
+                    # A partial file of a failed read is not left in the cache
+                    if os.path.exists(part_name):
+                        os.remove(part_name)
 
-        csv_data = StringIO(response.text)
-        reader = csv.reader(csv_data)
+                with open(key_name, "w") as key_file:
+                    json.dump(
+                        {"night": obs_date, "profile": profile, "content": content_key, "fetched": time.time()}, key_file
+                    )
 
-        for row in reader:
-            if len(row) > 1:
-                obs_csv_list.append(row)
+                shutil.copyfile("{0}/objects/{1}.csv".format(cache_folder, content_key), obs_file_name)
 
-        with open(
-            "{0}/{1}.csv".format(destination_folder, obs_date), "w", newline=""
-        ) as csvfile:
-            writer = csv.writer(csvfile)
+    except requests.RequestException as error:
+        # A network failure, before or while the body is read, is taken as an unavailable archive
+        logger.info("Obs fetch failed: {0} - {1}".format(obs_date, repr(error)))
+        fetch_status = 503
+        obs_list = None
 
-            # Write the header row
-            writer.writerow(obs_csv_list[0])
+    if obs_list is None and cache_entry is not None:
+        # The stale cached file is better than none
+        shutil.copyfile("{0}/objects/{1}.csv".format(cache_folder, cache_entry["content"]), obs_file_name)
+        obs_list = open_obs_file(logger, obs_file_name)
 
-            # Write the remaining data rows
-            writer.writerows(obs_csv_list[1:])
+        print("Error while fetching observation csv, stale cached one used ", fetch_status)
 
-    else:
-        print("Error while fetching observation csv ", response.status_code)
+    elif obs_list is None:
+        print("Error while fetching observation csv ", fetch_status)
 
-    return response.status_code
+    return [fetch_status, obs_list]
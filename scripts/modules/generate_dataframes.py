@@ -2,21 +2,35 @@ import time
 import re
 import logging
 import math
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+
+from modules.log_parsing import parsed_records
+from modules.parse_timestamp import ns_per_second
+
+
+"""
+Global variables:
+    tracking_time: Initialization of time for checkpoint monitoring
+"""
+tracking_time = time.time()
+
 
 def generate_dataframes(
-    logger: logging.Logger, parsed_data: list[dict[str, str]]
-) -> list[pd.DataFrame]:
+    logger: logging.Logger, parsed_data: list[dict] | pd.DataFrame
+) -> list[pd.DataFrame | np.ndarray]:
     """Generates dataframes for force distributions, correction instances, images and additional data, based on a list of previously 
     parsed data
 
     Args:    
         logger: Current script logging object.
-        parsed_data: List of dictionaries, each containing the log line dynamic parsed data
+        parsed_data: List of dictionaries, each containing the log line dynamic parsed data, already typed, and it's target dataframe
+            (or the dataframe of log_parsing_batch, with the same fields as columns)
 
     Returns:
-        List of dataframes for correction instances, force distributions, images and additional data, in that order.
+        List of dataframes for correction instances, force distributions, images and additional data, in that order, followed by the
+        matrix of forces (force distributions x actuators), where each force distribution's forces are in the row given by it's
+        forces_row column.
     """
 
     global tracking_time
@@ -37,7 +51,10 @@ def generate_dataframes(
         "img_path": [],
     }
 
-    dict_f_dist = {"id_f_dist": [], "forces": [], "timestamp": []}
+    dict_f_dist = {"id_f_dist": [], "forces_row": [], "timestamp": []}
+
+    # Arrays of forces of each force distribution, joined into a single matrix once every log line is read
+    f_dist_forces = []
 
     dict_additional_data = {
         "timestamp": [],
@@ -57,51 +74,42 @@ def generate_dataframes(
         "id_img_new": [],
     }
 
-    # Parses a log line's date
+    if isinstance(parsed_data, pd.DataFrame):
+        parsed_data = parsed_records(parsed_data)
+
+    # Routes each log line's typed data to it's target dataframe
     for line in parsed_data:
 
-        if line["group"] == "FORCES":
+        if line["target"] == "f_dist":
 
             if line["label"] == "f_id":
-                dict_f_dist["id_f_dist"].append(int(line["data"]))
-                dict_f_dist["forces"].append([])
-                dict_f_dist["timestamp"].append(
-                    datetime.strptime(line["time"].split(".")[0], "%H:%M:%S").time()
-                )
+                dict_f_dist["id_f_dist"].append(line["data"])
+                dict_f_dist["forces_row"].append(len(f_dist_forces))
+                f_dist_forces.append([])
+                dict_f_dist["timestamp"].append(line["timestamp"])
 
             elif line["label"] == "f_dist":
                 f_dist_index = len(dict_f_dist["id_f_dist"]) - 1
-                f_dist_content = line["data"].split()
 
                 if f_dist_index >= 0:
-                    for force in f_dist_content:
-                        dict_f_dist["forces"][f_dist_index].append(float(force))
+                    f_dist_forces[f_dist_index].append(np.asarray(line["data"], dtype=np.float64))
 
-        elif line["group"] == "INIT":
-            dict_corrections["timestamp"].append(
-                datetime.strptime(line["time"].split(".")[0], "%H:%M:%S").time()
-            )
+        elif line["target"] == "corrections":
+            dict_corrections["timestamp"].append(line["timestamp"])
             dict_corrections["id_f_dist_old"].append(None)
-            dict_corrections["id_f_dist_new"].append(int(line["data"]))
+            dict_corrections["id_f_dist_new"].append(line["data"])
             dict_corrections["id_img_old"].append(None)
             dict_corrections["id_img_new"].append(None)
 
-        elif line["group"] == "IMAGE":
+        elif line["target"] == "images":
 
             if line["label"] == "INTTIME":
                 dict_images["id_img"].append(None)
-                dict_images["exposition_start"].append(
-                    datetime.strptime(line["time"], "%H:%M:%S").time()
-                )
-                dict_images["integration_time"].append(int(line["data"]))
-                dict_images["readout_start"].append(
-                    datetime.strptime(line["time"], "%H:%M:%S").time()
-                )
+                dict_images["exposition_start"].append(line["timestamp"])
+                dict_images["integration_time"].append(line["data"])
+                dict_images["readout_start"].append(line["timestamp"])
                 dict_images["readout_stop"].append(
-                    (
-                        datetime.strptime(line["time"], "%H:%M:%S")
-                        + timedelta(seconds=float(line["data"]))
-                    ).time()
+                    line["timestamp"] + int(line["data"] * ns_per_second)
                 )
                 dict_images["ccd"].append(None)
                 dict_images["img_path"].append(None)
@@ -114,47 +122,32 @@ def generate_dataframes(
                     nu_img_flag = True
 
                 else:
-                    img_date = dict_images["exposition_start"][image_index]
-                    buffer_min_day = datetime(1970, 1, 1)
-                    acceptance_threshold = 2
+                    img_start = dict_images["exposition_start"][image_index]
+                    acceptance_threshold = 2 * ns_per_second
 
                     if (
                         dict_images["integration_time"][image_index] is not None
-                        and img_date
-                        <= datetime.strptime(line["time"], "%H:%M:%S").time()
-                        <= (
-                            datetime.combine(buffer_min_day, img_date)
-                            + timedelta(seconds=acceptance_threshold)
-                        ).time()
+                        and img_start <= line["timestamp"] <= img_start + acceptance_threshold
                     ):
-                        dict_images["id_img"][image_index] = int(line["data"])
+                        dict_images["id_img"][image_index] = line["data"]
                         dict_images["ccd"][image_index] = line["label"]
 
                     elif dict_images["integration_time"][image_index] is None:
                         nu_img_flag = True
 
                 if nu_img_flag:
-                    dict_images["id_img"].append(int(line["data"]))
-                    dict_images["exposition_start"].append(
-                        datetime.strptime(line["time"], "%H:%M:%S").time()
-                    )
+                    dict_images["id_img"].append(line["data"])
+                    dict_images["exposition_start"].append(line["timestamp"])
                     dict_images["integration_time"].append(None)
-                    dict_images["readout_start"].append(
-                        datetime.strptime(line["time"], "%H:%M:%S").time()
-                    )
+                    dict_images["readout_start"].append(line["timestamp"])
                     dict_images["readout_stop"].append(
-                        (
-                            datetime.strptime(line["time"], "%H:%M:%S")
-                            + timedelta(seconds=float(line["data"]))
-                        ).time()
+                        line["timestamp"] + int(line["data"] * ns_per_second)
                     )
                     dict_images["ccd"].append(line["label"])
                     dict_images["img_path"].append(None)
 
         else:
-            dict_additional_data["timestamp"].append(
-                datetime.strptime(line["time"], "%H:%M:%S").time()
-            )
+            dict_additional_data["timestamp"].append(line["timestamp"])
             dict_additional_data["group"].append(line["group"])
             dict_additional_data["label"].append(line["label"])
 
@@ -184,6 +177,25 @@ def generate_dataframes(
             except:
                 dict_additional_data["value_int"].append(-9999999)
 
+    # Contiguous matrix of forces (force distributions x actuators), padded with NaN for distributions with fewer actuators
+    num_actuators = [sum(len(forces) for forces in f_dist_arrays) for f_dist_arrays in f_dist_forces]
+
+    forces_matrix = np.full((len(f_dist_forces), max(num_actuators, default=0)), np.nan, dtype=np.float64)
+
+    for forces_row, f_dist_arrays in enumerate(f_dist_forces):
+        if num_actuators[forces_row] > 0:
+            forces_matrix[forces_row, : num_actuators[forces_row]] = np.concatenate(f_dist_arrays)
+
+    # Unix times, in nanoseconds, as absolute timestamps of the night
+    for dict_times, time_columns in [
+        (dict_f_dist, ["timestamp"]),
+        (dict_corrections, ["timestamp"]),
+        (dict_images, ["exposition_start", "readout_start", "readout_stop"]),
+        (dict_additional_data, ["timestamp"]),
+    ]:
+        for time_column in time_columns:
+            dict_times[time_column] = np.array(dict_times[time_column], dtype=np.int64).view("datetime64[ns]")
+
     # Assign id column to dataframes
     df_f_dist = pd.DataFrame(dict_f_dist)
 
@@ -202,5 +214,5 @@ def generate_dataframes(
     )
     tracking_time = time.time()
 
-    return [df_corrections, df_f_dist, df_images, df_additional_data]
+    return [df_corrections, df_f_dist, df_images, df_additional_data, forces_matrix]
 
@@ -1,7 +1,15 @@
 import time
 import logging
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+
+
+"""
+Global variables:
+    tracking_time: Initialization of time for checkpoint monitoring
+"""
+tracking_time = time.time()
+
 
 def link_dataframes(
     logger: logging.Logger,
@@ -10,7 +18,8 @@ def link_dataframes(
     name_attr: str,
     time_field: str,
 ) -> pd.DataFrame:
-    """Builds the relationships between df_corrections and an specified dataframe of related attributes.
+    """Builds the relationships between df_corrections and an specified dataframe of related attributes, with a backward and a
+    forward as-of join of every correction over the attributes sorted by time.
 
     Args:
         logger: Current script logging object.
@@ -28,78 +37,56 @@ def link_dataframes(
     logger.info("Start link dataframes: {0}".format(str(time.time() - tracking_time)))
     tracking_time = time.time()
 
-    halfday = datetime.strptime("12:00:00", "%H:%M:%S").time()
+    # Series indexes
+    old_id = "id_{0}_old".format(name_attr)
+    new_id = "id_{0}_new".format(name_attr)
+    attr_id = "id_{0}".format(name_attr)
 
-    num_corrections = len(df_corrections["id_corr"])
-
-    # New temporary column for better conditioning
-    buffer_c_day = datetime(1970, 1, 1)
+    if len(df_attr) == 0:
+        print("Dataframe for {0} is empty. No linking done.".format(name_attr))
 
-    try:
-        df_attr["unix"] = df_attr[time_field].apply(
-            lambda x: (
-                datetime.combine(buffer_c_day, x).timestamp()
-                if x >= halfday
-                else datetime.combine(buffer_c_day + timedelta(days=1), x).timestamp()
-            )
+    else:
+        # Attribute rows sorted by time, where only the first row of each repeated time can be linked
+        df_attr_times = (
+            df_attr[[time_field, attr_id]]
+            .rename(columns={time_field: "timestamp"})
+            .sort_values(by="timestamp", kind="stable")
+        )
+        df_attr_first = df_attr_times.drop_duplicates(subset="timestamp", keep="first")
+
+        # Set a maximum boundary from the max time in df_attr, whose rows are never linked as the old attribute
+        upper_boundary = df_attr_times["timestamp"].iloc[-1]
+        upper_attr_id = df_attr_first[attr_id].iloc[-1]
+
+        df_corr_times = pd.DataFrame(
+            {
+                "timestamp": df_corrections["timestamp"].to_numpy(dtype="datetime64[ns]"),
+                "position": np.arange(len(df_corrections)),
+            }
+        ).sort_values(by="timestamp", kind="stable")
+
+        # Old attribute: last one strictly before the correction (and the upper boundary), or -1 if there is none
+        df_old = pd.merge_asof(
+            df_corr_times,
+            df_attr_first[df_attr_first["timestamp"] < upper_boundary],
+            on="timestamp",
+            direction="backward",
+            allow_exact_matches=False,
         )
 
-        # Set a maximum boundary from the max time in df_attr's unix column
-        upper_boundary = df_attr["unix"].iloc[-1]
-
-        for index in range(num_corrections):
-
-            # Time of current correction
-            curr_time = df_corrections.loc[index, "timestamp"]
-
-            # Link with attribute
-            max_f_time = datetime.strptime("00:00:00", "%H:%M:%S").time()
-
-            # Series indexes
-            old_id = "id_{0}_old".format(name_attr)
-            new_id = "id_{0}_new".format(name_attr)
-            attr_id = "id_{0}".format(name_attr)
-
-            # Add unix column for better conditioning
-            buffer_day = datetime(1970, 1, 1)
-
-            if curr_time < halfday:
-                buffer_day += timedelta(days=1)
-
-            curr_unix = datetime.combine(buffer_day, curr_time).timestamp()
-
-            for f_time in df_attr["unix"]:
-
-                if curr_unix > f_time and upper_boundary > f_time:
-                    max_f_time = f_time
-
-                else:
-                    if max_f_time == datetime.strptime("00:00:00", "%H:%M:%S").time():
-                        after_index = df_attr["unix"].tolist().index(f_time)
-
-                        df_corrections.loc[index, old_id] = -1
-                        df_corrections.loc[index, new_id] = df_attr.loc[
-                            after_index, attr_id
-                        ]
-
-                    else:
-                        before_index = df_attr["unix"].tolist().index(max_f_time)
-                        after_index = df_attr["unix"].tolist().index(f_time)
+        # New attribute: first one at or after the correction, or the one at the upper boundary if there is none
+        df_new = pd.merge_asof(df_corr_times, df_attr_first, on="timestamp", direction="forward")
 
-                        df_corrections.loc[index, old_id] = df_attr.loc[
-                            before_index, attr_id
-                        ]
-                        df_corrections.loc[index, new_id] = df_attr.loc[
-                            after_index, attr_id
-                        ]
+        id_dtype = df_attr[attr_id].dtype
 
-                    break
+        old_ids = np.empty(len(df_corrections), dtype=id_dtype)
+        old_ids[df_old["position"].to_numpy()] = df_old[attr_id].fillna(-1).astype(id_dtype).to_numpy()
 
-        # Remove temporary column
-        df_attr.drop("unix", axis=1, inplace=True)
+        new_ids = np.empty(len(df_corrections), dtype=id_dtype)
+        new_ids[df_new["position"].to_numpy()] = df_new[attr_id].fillna(upper_attr_id).astype(id_dtype).to_numpy()
 
-    except IndexError:
-        print("Dataframe for {0} is empty. No linking done.".format(name_attr))
+        df_corrections[old_id] = old_ids
+        df_corrections[new_id] = new_ids
 
     ### Checkpoint - End link dataframes
     logger.info("End link dataframes: {0}".format(str(time.time() - tracking_time)))
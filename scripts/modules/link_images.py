@@ -1,17 +1,31 @@
 import time
 import logging
-import os
 import pandas as pd
-from astropy.io import fits
+
+from modules.scan_fits_headers import scan_fits_headers
+
+
+"""
+Global variables:
+    tracking_time: Initialization of time for checkpoint monitoring
+"""
+tracking_time = time.time()
+
 
 def link_images(
-    logger: logging.Logger, df_images: pd.DataFrame, img_folder: str
+    logger: logging.Logger,
+    df_images: pd.DataFrame,
+    img_folder: str,
+    index_name: str,
 ) -> pd.DataFrame:
-    """Builds the relationships between df_images and the images fits archives
+    """Builds the relationships between df_images and the images fits archives, joining the exposure number of each fits header
+    with the image ids through a dictionary
 
-    Args:    
+    Args:
         logger: Current script logging object.
         df_images: Dataframe of images.
+        img_folder: Folder relative path of the fits archives.
+        index_name: SQLite file relative path of the index of fits headers, shared between the runs with the same output folder.
 
     Returns:
         nu_df_images: Dataframe of images with corrected information
@@ -23,37 +37,39 @@ def link_images(
     logger.info("Start link images: {0}".format(str(time.time() - tracking_time)))
     tracking_time = time.time()
 
-    for img_name in os.listdir(img_folder):
-        with fits.open("{0}/{1}".format(img_folder, img_name)) as hdul:
-            # Print information about the FITS file structure
-            # hdul.info()
+    img_headers = scan_fits_headers(logger, img_folder, index_name)
+
+    # Position of the first image of each id
+    img_rows = {}
+
+    for img_row, img_id in enumerate(df_images["id_img"].tolist()):
+        img_rows.setdefault(img_id, img_row)
 
-            # Access the primary HDU
-            primary_hdu = hdul[0]
+    integration_times = df_images["integration_time"].tolist()
 
-            # Get the header information
-            header_info = primary_hdu.header
+    # Path of each linked image, by position (a later archive of the same image replaces the earlier one)
+    img_paths = {}
 
-            # img_date = header_info['DATE-OBS']
-            inttime = header_info["EXPTIME"]
-            exp_no = header_info["HIERARCH ESO DET EXP NO"]
+    for img_name, exp_no, inttime, _ in img_headers:
+        if exp_no is None or inttime is None or exp_no not in img_rows:
+            # print('No match: {0}'.format(img_name))
+            continue
 
-            try:
-                index_img_list = df_images["id_img"].tolist().index(int(exp_no))
+        img_row = img_rows[exp_no]
 
-            except ValueError:
-                # print('No match: {0}'.format(img_name))
-                continue
+        if integration_times[img_row] == int(inttime):
+            img_paths[img_row] = img_name
 
-            else:
-                if df_images["integration_time"][index_img_list] == int(inttime):
-                    df_images.loc[index_img_list, "img_path"] = img_name
+        else:
+            print("Different inttime: {0}".format(img_name))
 
-                else:
-                    print("Different inttime: {0}".format(img_name))
+    if len(img_paths) > 0:
+        df_images.loc[list(img_paths.keys()), "img_path"] = list(img_paths.values())
 
     ### Checkpoint - End link images
-    logger.info("End link images: {0}".format(str(time.time() - tracking_time)))
+    logger.info(
+        "End link images: {0} - Images linked: {1}".format(str(time.time() - tracking_time), str(len(img_paths)))
+    )
     tracking_time = time.time()
 
-    return df_images
\ No newline at end of file
+    return df_images
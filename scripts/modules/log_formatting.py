@@ -1,16 +1,29 @@
 import time
-import re
 import logging
 
-def log_formatting(logger: logging.Logger, log_lines: list[str]) -> list[str]:
-    """Removes the header and clears problematic characters of each log line
+from modules.log_table import LogTable
+
+
+"""
+Global variables:
+    tracking_time: Initialization of time for checkpoint monitoring
+"""
+tracking_time = time.time()
+
+
+def log_formatting(
+    logger: logging.Logger, log_lines: list[bytes], date: str, strip_header: bool = True
+) -> LogTable:
+    """Tokenizes each log line into it's header fields, removing the header and clearing problematic characters of the message
 
     Args:
         logger: Current script logging object
-        log_lines: List of log lines, in string form
+        log_lines: List of raw log lines, in bytes form
+        date: Date, in string form, of the night of the log file
+        strip_header: Flag for the removal of the header from the messages
 
     Returns:
-        A list of pre-processed log lines in string format
+        A LogTable, with the timestamp of the header and the pre-processed message of each log line
     """
 
     global tracking_time
@@ -19,28 +32,14 @@ def log_formatting(logger: logging.Logger, log_lines: list[str]) -> list[str]:
     logger.info("Start log formatting: {0}".format(str(time.time() - tracking_time)))
     tracking_time = time.time()
 
-    headerless_lines = []
-
-    for _, line in enumerate(log_lines):
-
-        # Log line header removal
-        header_re = re.compile(
-            r"([a-zA-Z]{3}\s[0-9]{2}\s[0-9]{2}:[0-9]{2}:[0-9]{2}?)\swt[1-4]tcs\s(.+)(\[[0-9]+\]):\s"
-        )
-
-        headerless_line = re.sub(header_re, "", line)
-
-        headerless_line = headerless_line.replace("  ", " ")
-        headerless_lines.append(headerless_line)
-
-        ### Checkpoint - Line added to current list
-        logger.info(
-            "Line added to current list: {0}".format(str(time.time() - tracking_time))
-        )
-        tracking_time = time.time()
+    log_table = LogTable.from_lines(log_lines, date, strip_header)
 
     ### Checkpoint - End log formatting
-    logger.info("End log formatting: {0}".format(str(time.time() - tracking_time)))
+    logger.info(
+        "End log formatting: {0} - Lines formatted: {1}".format(
+            str(time.time() - tracking_time), str(len(log_table))
+        )
+    )
     tracking_time = time.time()
 
-    return headerless_lines
+    return log_table
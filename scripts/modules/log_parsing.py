@@ -1,20 +1,101 @@
 import time
 import re
 import logging
+import math
+import numpy as np
+import pandas as pd
 from datetime import datetime, timedelta
 
+from modules.log_table import LogTable
+from modules.template_registry import TemplateRegistry, group_name_re, parse_floats
+from modules.parse_timestamp import (
+    parse_time,
+    parse_date,
+    parse_time_column,
+    parse_date_column,
+    absolute_time,
+    absolute_time_column,
+)
+
+
+"""
+Global variables:
+    tracking_time: Initialization of time for checkpoint monitoring
+    deleted_line_re: Compiled regular expression of the force and image lines logged when deleted by the parsing
+    batch_converters: Vectorized equivalent of the field type converters, applied to a whole column of matched strings
+"""
+tracking_time = time.time()
+
+deleted_line_re = re.compile(
+    r"Executed cmd #([0-9.-]+)|EXP NO = ([0-9]+)|([0-2][0-9]:[0-5][0-9]:[0-5][0-9](.[0-9]+)*)> TEL ACTO (INTTIME)"
+)
+
+
+def split_floats(column: pd.Series) -> pd.Series:
+    """Converts a column of whitespace separated lists of numbers into floats, tokenizing the whole column in a single vectorized
+    conversion
+
+    Args:
+        column: Column of numbers, in string form
+
+    Returns:
+        A column of arrays of float64, each one a view of the array of every number of the column
+    """
+
+    if len(column) == 0:
+        return column
+
+    num_numbers = column.str.split().str.len().to_numpy()
+    numbers = np.array(" ".join(column).split(), dtype=np.float64)
+
+    return pd.Series(np.split(numbers, np.cumsum(num_numbers)[:-1]), index=column.index, dtype=object)
+
+
+def integer_objects(parsed_frame: pd.DataFrame) -> pd.DataFrame:
+    """Turns the integer columns of the parsed frame of a template into columns of Python integers, so they are not cast into
+    floats when they are concatenated with the frames of the templates that don't have them
+
+    Args:
+        parsed_frame: Dataframe of the log lines parsed by a template, with a column by field
+
+    Returns:
+        The dataframe, with it's integer columns as objects
+    """
+
+    return parsed_frame.astype(
+        {column: object for column in parsed_frame.columns if parsed_frame[column].dtype.kind in "iu"}
+    )
+
+
+batch_converters = {
+    str: lambda column: column,
+    int: lambda column: column.astype(np.int64),
+    float: lambda column: column.astype(np.float64),
+    parse_floats: split_floats,
+    parse_time: parse_time_column,
+    parse_date: parse_date_column,
+}
+
+
 def log_parsing_regex(
-    logger: logging.Logger, log_sections: dict, templates_list: list[str]
+    logger: logging.Logger,
+    log_table: LogTable,
+    line_indices: np.ndarray,
+    template_registry: TemplateRegistry,
+    line_instruments: np.ndarray = None,
 ) -> list[dict]:
-    """Parses each log line and extracts their dynamic data, using regular expressions
+    """Parses each log line and extracts their dynamic data, already typed, using a single regular expression that combines every
+    template
 
     Args:
         logger: Current script logging object
-        log_sections: List of log lines, grouped by successful observation period, in string form
-        templates_list: List of log line parsing templates, in string form
+        log_table: Table of log lines, as tokenized by log_formatting
+        line_indices: Ordered array of positions in the table of the log lines to be parsed, each one parsed once
+        template_registry: Registry of the compiled log line parsing templates
+        line_instruments: Array of labels of the observation instruments of each log line, aligned with line_indices
 
     Returns:
-        A list of dictionaries, with each containing the dynamic data extracted from a log line
+        A list of dictionaries, with each containing the dynamic data extracted from a log line and the dataframe it goes to
     """
 
     global tracking_time
@@ -26,166 +107,234 @@ def log_parsing_regex(
     parsed_data = []
     num_lines_parsed = 0
 
-    for log_section_key in log_sections.keys().__iter__():
-        for line in log_sections[log_section_key]:
-            result = {}
-            parsing_flag = False
-
-            # Parses keywords
-            check_forces = re.search(r"SetGlb[Abs|Rel]", line)
-            check_exp_no = re.search(r"EXP NO", line)
-            check_inttime = re.search(r"INTTIME", line)
-            check_add_data = re.search(r"TEL", line)
-
-            if check_forces is not None:
-                # print(line)
-                check_f_dist = re.search(r"Forces", line)
-                check_f_header = re.search(r"Executed", line)
-                check_f_init = re.search(r"Received", line)
+    header_times = log_table.timestamps[line_indices].tolist()
+
+    for line_position, line in enumerate(log_table.messages(line_indices)):
+        # Finds the matching template, and it's typed fields, in a single scan of the line
+        template_match = template_registry.parse(line)
+
+        if template_match is not None:
+            template_index, result = template_match
+
+            # Save parsing result
+            result["target"] = template_registry.targets[template_index]
+            result["template_id"] = template_registry.template_ids[template_index]
+
+            # Unix time, in nanoseconds, of the time of day of the line, placed in the night by it's header
+            if result.get("time") is not None:
+                result["timestamp"] = absolute_time(result["time"], header_times[line_position], log_table.date)
+
+            if line_instruments is not None:
+                result["instruments"] = line_instruments[line_position]
+
+            parsed_data.append(result)
+
+            ### Checkpoint - Log line parsing successful
+            logger.info(
+                "Log line parsing succesful: {0}".format(
+                    str(time.time() - tracking_time)
+                )
+            )
+            tracking_time = time.time()
+
+            num_lines_parsed += 1
+
+        else:
+            deleted_line = deleted_line_re.search(line)
+
+            if deleted_line is not None:
+                logger.info(
+                    "{0} deleted by log_parsing_regex".format(deleted_line.group())
+                )
 
-                if check_f_dist is not None:
-                    template = templates_list[0]
-                    template = template.replace("\n", "")
+    ### Checkpoint - End log line parsing
+    logger.info(
+        "End log line parsing: {0} - Lines parsed: {1}".format(
+            str(time.time() - tracking_time), str(num_lines_parsed)
+        )
+    )
+    tracking_time = time.time()
 
-                    # Parsing with regular expressions
-                    parser = re.search(template, line)
+    return parsed_data
 
-                    # If match is true, the data extracted is saved and jumps into the next log line
-                    if parser is not None:
-                        parsing_flag = True
 
-                        result["group"] = "FORCES"
-                        result["label"] = "f_dist"
-                        result["date"] = parser.group(2)
-                        result["time"] = parser.group(3)
-                        result["data"] = parser.group(6)
+def log_parsing_batch(
+    logger: logging.Logger,
+    log_table: LogTable,
+    line_indices: np.ndarray,
+    template_registry: TemplateRegistry,
+    line_instruments: np.ndarray = None,
+) -> pd.DataFrame:
+    """Parses the log lines as a single column and extracts their dynamic data, already typed, with one vectorized pass by template.
+    The lines are routed to each template by it's keywords, and the few lines that more than one template matches are parsed one by
+    one, so the result is the same as the one of log_parsing_regex
 
-                elif check_f_header is not None:
-                    template = templates_list[1]
-                    template = template.replace("\n", "")
+    Args:
+        logger: Current script logging object
+        log_table: Table of log lines, as tokenized by log_formatting
+        line_indices: Ordered array of positions in the table of the log lines to be parsed, each one parsed once
+        template_registry: Registry of the compiled log line parsing templates
+        line_instruments: Array of labels of the observation instruments of each log line, aligned with line_indices
 
-                    # Parsing with regular expressions
-                    parser = re.search(template, line)
+    Returns:
+        A dataframe, with a row by parsed log line in the order of the lines, and a column by field (NaN where the template of the
+        row has no such field)
+    """
 
-                    # If match is true, the data extracted is saved and jumps into the next log line
-                    if parser is not None:
-                        parsing_flag = True
+    global tracking_time
 
-                        result["group"] = "FORCES"
-                        result["label"] = "f_id"
-                        result["date"] = parser.group(2)
-                        result["time"] = parser.group(3)
-                        result["data"] = parser.group(5)
+    ### Checkpoint - Start log line batch parsing
+    logger.info("Start log line batch parsing: {0}".format(str(time.time() - tracking_time)))
+    tracking_time = time.time()
 
-                elif check_f_init is not None:
-                    template = templates_list[2]
-                    template = template.replace("\n", "")
+    lines = pd.Series(log_table.messages(line_indices), dtype=object)
 
-                    # Parsing with regular expressions
-                    parser = re.search(template, line)
+    template_extracts = []
+    template_masks = np.zeros((len(template_registry), len(lines)), dtype=bool)
 
-                    # If match is true, the data extracted is saved and jumps into the next log line
-                    if parser is not None:
-                        parsing_flag = True
+    for template_index, template in enumerate(template_registry.templates):
+        # Vectorized routing, by the keywords that every line matching the template contains
+        keyword_mask = np.ones(len(lines), dtype=bool)
 
-                        result["time"] = parser.group(3)
-                        result["data"] = parser.group(5)
-                        result["group"] = "INIT"
+        for keyword in template_registry.keywords[template_index]:
+            keyword_mask &= lines.str.contains(keyword, regex=False).to_numpy(dtype=bool)
 
-            elif check_exp_no is not None:
-                template = templates_list[3]
-                template = template.replace("\n", "")
+        candidates = lines[keyword_mask]
 
-                # Parsing with regular expressions
-                parser = re.search(template, line)
+        # Group names are dropped and the whole template is wrapped, so column n holds group n of the template
+        extract = candidates.str.extract("({0})".format(group_name_re.sub("(", template)), expand=True)
+        extract = extract[extract[0].notna()]
 
-                # If match is true, the data extracted is saved and jumps into the next log line
-                if parser is not None:
-                    parsing_flag = True
+        template_extracts.append(extract)
+        template_masks[template_index, extract.index.to_numpy()] = True
 
-                    result["time"] = parser.group(2)
-                    result["group"] = "IMAGE"
-                    result["label"] = parser.group(5)
-                    result["data"] = parser.group(4)
+    num_templates_matched = template_masks.sum(axis=0)
+    ambiguous_mask = num_templates_matched > 1
 
-            elif check_inttime is not None:
-                template = templates_list[4]
-                template = template.replace("\n", "")
+    parsed_frames = []
 
-                # Parsing with regular expressions
-                parser = re.search(template, line)
+    for template_index, extract in enumerate(template_extracts):
+        extract = extract[~ambiguous_mask[extract.index.to_numpy()]]
 
-                # If match is true, the data extracted is saved and jumps into the next log line
-                if parser is not None:
-                    parsing_flag = True
+        if len(extract) == 0:
+            continue
 
-                    result["time"] = parser.group(2)
-                    result["group"] = "IMAGE"
-                    result["label"] = parser.group(4)
-                    result["data"] = parser.group(5)
+        columns = {
+            field_name: batch_converters.get(field_converter, lambda column: column.map(field_converter))(
+                extract[field_group]
+            ).tolist()
+            for field_name, field_group, field_converter in template_registry.extractors[template_index]
+        }
 
-            elif check_add_data is not None:
-                for template_ind in range(5, len(templates_list)):
-                    template = templates_list[template_ind]
-                    template = template.replace("\n", "")
+        parsed_frame = pd.DataFrame(columns, index=extract.index)
 
-                    # Parsing with regular expressions
-                    parser = re.search(template, line)
-
-                    # If match is true, the data extracted is saved and jumps into the next log line
-                    if parser is not None:
-                        parsing_flag = True
+        for field_name, field_value in template_registry.constants[template_index].items():
+            parsed_frame.insert(0, field_name, field_value)
 
-                        result["time"] = parser.group(2)
-                        result["group"] = parser.group(4)
-                        result["label"] = parser.group(5)
-                        result["data"] = parser.group(6)
+        parsed_frame["target"] = template_registry.targets[template_index]
+        parsed_frame["template_id"] = template_registry.template_ids[template_index]
 
-                        break
+        parsed_frames.append(integer_objects(parsed_frame))
 
-            # Save parsing result
-            if parsing_flag:
-                parsed_data.append(result)
+    # Lines where more than one template matches are dispatched by the combined regular expression, as in log_parsing_regex
+    ambiguous_rows = []
 
-                ### Checkpoint - Log line parsing successful
-                logger.info(
-                    "Log line parsing succesful: {0}".format(
-                        str(time.time() - tracking_time)
-                    )
-                )
-                tracking_time = time.time()
+    for line_position in np.flatnonzero(ambiguous_mask).tolist():
+        template_index, result = template_registry.parse(lines[line_position])
 
-                num_lines_parsed += 1
+        result["target"] = template_registry.targets[template_index]
+        result["template_id"] = template_registry.template_ids[template_index]
 
-            else:
-                force_line = re.search(r"Executed cmd #([0-9.-]+)", line)
-                img_line = re.search(r"EXP NO = ([0-9]+)", line)
-                img_line_2 = re.search(
-                    r"([0-2][0-9]:[0-5][0-9]:[0-5][0-9](.[0-9]+)*)> TEL ACTO (INTTIME)",
-                    line,
-                )
+        ambiguous_rows.append(result)
 
-                if force_line is not None:
-                    logger.info(
-                        "{0} deleted by log_parsing_regex".format(force_line.group())
-                    )
+    if len(ambiguous_rows) > 0:
+        parsed_frames.append(integer_objects(pd.DataFrame(ambiguous_rows, index=np.flatnonzero(ambiguous_mask))))
 
-                elif img_line is not None:
-                    logger.info(
-                        "{0} deleted by log_parsing_regex".format(img_line.group())
-                    )
+    if len(parsed_frames) == 0:
+        parsed_data = pd.DataFrame()
 
-                elif img_line_2 is not None:
-                    logger.info(
-                        "{0} deleted by log_parsing_regex".format(img_line_2.group())
-                    )
+    else:
+        parsed_data = pd.concat(parsed_frames).sort_index(kind="stable")
 
-    ### Checkpoint - End log line parsing
+        if "time" in parsed_data.columns:
+            timed_rows = parsed_data["time"].notna().to_numpy()
+
+            timestamps = np.full(len(parsed_data), np.nan, dtype=object)
+            timestamps[timed_rows] = absolute_time_column(
+                parsed_data["time"].to_numpy()[timed_rows],
+                log_table.timestamps[line_indices][parsed_data.index.to_numpy()[timed_rows]],
+                log_table.date,
+            ).tolist()
+
+            parsed_data["timestamp"] = timestamps
+
+        if line_instruments is not None:
+            parsed_data["instruments"] = np.asarray(line_instruments, dtype=object)[parsed_data.index.to_numpy()]
+
+        parsed_data = parsed_data.reset_index(drop=True)
+
+    for line in lines[num_templates_matched == 0]:
+        deleted_line = deleted_line_re.search(line)
+
+        if deleted_line is not None:
+            logger.info("{0} deleted by log_parsing_batch".format(deleted_line.group()))
+
+    ### Checkpoint - End log line batch parsing
     logger.info(
-        "End log line parsing: {0} - Lines parsed: {1}".format(
-            str(time.time() - tracking_time), str(num_lines_parsed)
+        "End log line batch parsing: {0} - Lines parsed: {1}".format(
+            str(time.time() - tracking_time), str(len(parsed_data))
         )
     )
     tracking_time = time.time()
 
     return parsed_data
+
+
+def parsed_records(parsed_data: pd.DataFrame, template_registry: TemplateRegistry = None) -> list[dict]:
+    """Converts the dataframe of log_parsing_batch into the list of dictionaries of log_parsing_regex
+
+    Args:
+        parsed_data: Dataframe, with a row by parsed log line and a column by field
+        template_registry: Registry of the templates that parsed the lines, which gives the fields of each dictionary the order
+            log_parsing_regex writes them in (the order of the columns is kept if None)
+
+    Returns:
+        A list of dictionaries, with each containing the dynamic data extracted from a log line, without the fields that the
+        template of the line does not have
+    """
+
+    # Fields of the lines of each template, in the order of log_parsing_regex: constants, extracted fields and the added ones
+    field_orders = {}
+
+    if template_registry is not None:
+        field_orders = {
+            template_id: [
+                *template_registry.constants[template_index].keys(),
+                *[field_name for field_name, _, _ in template_registry.extractors[template_index]],
+                "target",
+                "template_id",
+                "timestamp",
+                "instruments",
+            ]
+            for template_index, template_id in enumerate(template_registry.template_ids)
+        }
+
+    records = []
+
+    for record in parsed_data.to_dict("records"):
+        record = {
+            field_name: field_value
+            for field_name, field_value in record.items()
+            if not (isinstance(field_value, float) and math.isnan(field_value))
+        }
+
+        if record.get("template_id") in field_orders:
+            record = {
+                field_name: record[field_name]
+                for field_name in field_orders[record["template_id"]]
+                if field_name in record
+            }
+
+        records.append(record)
+
+    return records
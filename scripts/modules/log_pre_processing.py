@@ -1,17 +1,27 @@
 import time
-import re
 import logging
+import numpy as np
 
-def log_pre_processing(logger: logging.Logger, log_lines: list[str]) -> list[list[str]]:
-    """Removes the header of each log line and groups them in blocks, according to the timeframe between the VLT autoguider stopping an iteration
+from modules.log_table import LogTable
+
+
+"""
+Global variables:
+    tracking_time: Initialization of time for checkpoint monitoring
+"""
+tracking_time = time.time()
+
+
+def log_pre_processing(logger: logging.Logger, log_table: LogTable) -> list[np.ndarray]:
+    """Groups the headerless log lines in blocks, according to the timeframe between the VLT autoguider stopping an iteration
     and the beggining of the following iteration, which corresponds to an observation period
 
     Args:
         logger: Current script logging object
-        log_lines: List of log lines, in string form
+        log_table: Table of log lines, as tokenized by log_formatting
 
     Returns:
-        A list of lists, with each containing a group of tuples, with the id of an observation first and the pre-processed log line last, fitted by observation period
+        A list of arrays, with each containing the positions in the table of a group of log lines, fitted by observation period
     """
 
     global tracking_time
@@ -22,47 +32,39 @@ def log_pre_processing(logger: logging.Logger, log_lines: list[str]) -> list[lis
     )
     tracking_time = time.time()
 
-    headerless_lines = []
+    section_bounds = []
     extraction_flag = False
-    num_lines_inserted = 0
 
-    for index, line in enumerate(log_lines):
+    # Only the AG.GUIDE lines can open or close a section
+    for index in log_table.find_lines(b"AG.GUIDE").tolist():
+        headerless_line = log_table.message(index)
 
-        # Log line header removal
-        header_re = re.compile(
-            r"([a-zA-Z]{3}\s[0-9]{2}\s[0-9]{2}:[0-9]{2}:[0-9]{2}?)\swt[1-4]tcs\s(.+)(\[[0-9]+\]):\s"
-        )
-
-        headerless_line = re.sub(header_re, "", line)
+        if headerless_line.find("STOP") != -1:
+            # Start log line extraction
+            if extraction_flag:
+                section_bounds[-1][1] = index
 
-        if headerless_line.find("AG.GUIDE") != -1:
-            ### Checkpoint - AG.GUIDE line found
-            logger.info(
-                "AG.GUIDE line found: {0}".format(str(time.time() - tracking_time))
-            )
-            tracking_time = time.time()
+            section_bounds.append([index, len(log_table), []])
+            extraction_flag = True
 
-            if headerless_line.find("STOP") != -1:
-                # Start log line extraction
-                headerless_lines.append([])
-                extraction_flag = True
+        elif headerless_line.find("START") != -1:
+            # Finish log line extraction
+            if extraction_flag:
+                section_bounds[-1][1] = index + 1
 
-            elif headerless_line.find("START") != -1:
-                # Finish log line extraction
-                if len(headerless_lines) != 0:
-                    headerless_lines[-1].append((index, headerless_line))
+            elif len(section_bounds) != 0:
+                section_bounds[-1][2].append(index)
 
-                extraction_flag = False
+            extraction_flag = False
 
-        if extraction_flag:
-            headerless_line = headerless_line.replace("  ", " ")
-            headerless_lines[-1].append((index, headerless_line))
-
-            ### Checkpoint - Line added to current list
-            logger.info("Line {0} added to current list".format(index))
-            tracking_time = time.time()
+    headerless_sections = [
+        np.concatenate(
+            [np.arange(section_start, section_stop), np.array(extra_indices, dtype=np.int64)]
+        )
+        for section_start, section_stop, extra_indices in section_bounds
+    ]
 
-            num_lines_inserted += 1
+    num_lines_inserted = sum(len(section) for section in headerless_sections)
 
     ### Checkpoint - End log pre-processing
     logger.info(
@@ -72,4 +74,4 @@ def log_pre_processing(logger: logging.Logger, log_lines: list[str]) -> list[lis
     )
     tracking_time = time.time()
 
-    return headerless_lines
+    return headerless_sections
@@ -0,0 +1,168 @@
+import time
+import re
+import logging
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+"""
+Global variables:
+    tracking_time: Initialization of time for checkpoint monitoring
+"""
+tracking_time = time.time()
+
+
+def template_keywords(words_list: list[list[str]], extra_keywords: tuple = ()) -> list[str]:
+    """Picks, for each template, the longest of the words that any line matching said template must contain
+
+    Args:
+        words_list: List of lists, one by template, of the words that any line matching the template must contain
+        extra_keywords: Additional keywords to be kept, used by stages other than the parsing
+
+    Returns:
+        A list of keywords, without the ones that already contain a shorter keyword of the list
+    """
+
+    keywords = list(extra_keywords)
+
+    for words in words_list:
+        # A template without words can match any line, so nothing can be filtered
+        if len(words) == 0:
+            return []
+
+        # On ties the later word is kept, as templates start with the generic part of the line
+        keywords.append(max(reversed(words), key=len))
+
+    # Any line with a keyword that contains another one is already kept by the shorter one
+    minimal_keywords = []
+
+    for keyword in sorted(set(keywords), key=len):
+        if not any(kept in keyword for kept in minimal_keywords):
+            minimal_keywords.append(keyword)
+
+    return minimal_keywords
+
+
+def keywords_pattern(keywords: list[str]) -> re.Pattern:
+    """Compiles the keywords, a single time, into a multi-pattern search over raw log bytes
+
+    Args:
+        keywords: List of keywords, as extracted by template_keywords, whose escaped alternation is compiled
+
+    Returns:
+        The compiled alternation of the keywords, or None if there are no keywords (so nothing can be filtered)
+    """
+
+    if len(keywords) == 0:
+        return None
+
+    return re.compile(b"|".join(re.escape(keyword.encode("iso-8859-1")) for keyword in keywords))
+
+
+def template_words(template: str) -> list[str]:
+    """Extracts the literal words that any line matching a template must contain
+
+    Args:
+        template: Log line parsing template, in string form
+
+    Returns:
+        A list of the words, in the order they appear in the template
+    """
+
+    words = []
+
+    for literal_run in required_literals(sre_parse.parse(template)):
+        words.extend(literal_run.split())
+
+    return words
+
+
+def required_literals(parsed_pattern) -> list[str]:
+    """Walks a parsed regular expression and collects the runs of literal characters that are not optional
+
+    Args:
+        parsed_pattern: Regular expression, as parsed by the re module's parser
+
+    Returns:
+        A list of runs of consecutive literal characters
+    """
+
+    literal_runs = [""]
+
+    def walk(items):
+        for op, av in items:
+            if op is sre_parse.LITERAL:
+                literal_runs[-1] += chr(av)
+
+            elif op is sre_parse.SUBPATTERN:
+                # Non repeated groups are inlined, so their literals join the surrounding run
+                walk(av[-1])
+
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+                literal_runs.append("")
+                walk(av[2])
+                literal_runs.append("")
+
+            else:
+                literal_runs.append("")
+
+    walk(parsed_pattern)
+
+    return [literal_run for literal_run in literal_runs if literal_run != ""]
+
+
+def log_prefilter(logger: logging.Logger, raw_chunk: bytes, keyword_re: re.Pattern) -> list[bytes]:
+    """Scans a chunk of raw log bytes for any of the keywords and keeps only the lines where one of them is found, before any
+    decoding or regular expression processing is done on them
+
+    Args:
+        logger: Current script logging object
+        raw_chunk: Chunk of the original log file, in bytes form, ending at a line boundary
+        keyword_re: Compiled search of the keywords, as built by keywords_pattern (no prefiltering if None)
+
+    Returns:
+        A list of the candidate log lines, in bytes form
+    """
+
+    global tracking_time
+
+    ### Checkpoint - Start log prefiltering
+    logger.info("Start log prefiltering: {0}".format(str(time.time() - tracking_time)))
+    tracking_time = time.time()
+
+    if keyword_re is None:
+        return raw_chunk.splitlines(keepends=True)
+
+    # Multi-pattern search of all the keywords in a single scan of the chunk
+    candidate_lines = []
+    position = 0
+
+    while True:
+        match = keyword_re.search(raw_chunk, position)
+
+        if match is None:
+            break
+
+        line_start = raw_chunk.rfind(b"\n", 0, match.start()) + 1
+        line_end = raw_chunk.find(b"\n", match.end())
+
+        if line_end == -1:
+            line_end = len(raw_chunk) - 1
+
+        candidate_lines.append(raw_chunk[line_start : line_end + 1])
+
+        # Continues the scan from the next line
+        position = line_end + 1
+
+    ### Checkpoint - End log prefiltering
+    logger.info(
+        "End log prefiltering: {0} - Lines kept: {1}".format(
+            str(time.time() - tracking_time), str(len(candidate_lines))
+        )
+    )
+    tracking_time = time.time()
+
+    return candidate_lines
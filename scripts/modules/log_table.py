@@ -0,0 +1,175 @@
+import numpy as np
+
+from modules.log_tokenizer import split_line
+
+
+class LogTable:
+    """Columnar representation of a chunk of tokenized log lines, with one array per header field and every message stored in a single
+    bytes buffer
+
+    Attributes:
+        timestamps: Array of the Unix time, in seconds, of each log line header (-1 if the line has no header)
+        host_codes: Array of the code of each log line host, as an index of host_names (-1 if the line has no header)
+        host_names: List of the distinct host names, in string form
+        process_codes: Array of the code of each log line process, as an index of process_names (-1 if the line has no header)
+        process_names: List of the distinct process names, in string form
+        pids: Array of the process id of each log line (-1 if the line has no header)
+        offsets: Array of the position of each log line message in the buffer
+        lengths: Array of the length of each log line message in the buffer
+        buffer: Every log line message, one after another, in bytes form
+        date: Date, in string form, of the night of the log file
+    """
+
+    __slots__ = (
+        "timestamps",
+        "host_codes",
+        "host_names",
+        "process_codes",
+        "process_names",
+        "pids",
+        "offsets",
+        "lengths",
+        "buffer",
+        "date",
+    )
+
+    def __init__(
+        self,
+        timestamps: np.ndarray,
+        host_codes: np.ndarray,
+        host_names: list[str],
+        process_codes: np.ndarray,
+        process_names: list[str],
+        pids: np.ndarray,
+        offsets: np.ndarray,
+        lengths: np.ndarray,
+        buffer: bytes,
+        date: str,
+    ):
+        self.timestamps = timestamps
+        self.host_codes = host_codes
+        self.host_names = host_names
+        self.process_codes = process_codes
+        self.process_names = process_names
+        self.pids = pids
+        self.offsets = offsets
+        self.lengths = lengths
+        self.buffer = buffer
+        self.date = date
+
+    @classmethod
+    def from_lines(cls, log_lines: list[bytes], date: str, strip_header: bool = True) -> "LogTable":
+        """Tokenizes raw log lines into a new LogTable
+
+        Args:
+            log_lines: List of raw log lines, in bytes form
+            date: Date, in string form, of the night of the log file
+            strip_header: Flag for the removal of the header from the messages
+
+        Returns:
+            A LogTable with the log lines
+        """
+
+        num_lines = len(log_lines)
+
+        timestamps = np.empty(num_lines, dtype=np.int64)
+        host_codes = np.empty(num_lines, dtype=np.int16)
+        process_codes = np.empty(num_lines, dtype=np.int16)
+        pids = np.empty(num_lines, dtype=np.int32)
+        lengths = np.empty(num_lines, dtype=np.int32)
+
+        host_index = {}
+        process_index = {}
+        messages = []
+
+        for index, line in enumerate(log_lines):
+            timestamp, host, process, pid, message = split_line(line, date, strip_header)
+
+            timestamps[index] = timestamp
+            pids[index] = pid
+            lengths[index] = len(message)
+            messages.append(message)
+
+            if timestamp == -1:
+                host_codes[index] = -1
+                process_codes[index] = -1
+
+            else:
+                host_codes[index] = host_index.setdefault(host, len(host_index))
+                process_codes[index] = process_index.setdefault(process, len(process_index))
+
+        offsets = np.zeros(num_lines, dtype=np.int64)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+
+        return cls(
+            timestamps,
+            host_codes,
+            [host.decode("iso-8859-1") for host in host_index],
+            process_codes,
+            [process.decode("iso-8859-1") for process in process_index],
+            pids,
+            offsets,
+            lengths,
+            b"".join(messages),
+            date,
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def message(self, index: int) -> str:
+        """Decodes the message of a single log line
+
+        Args:
+            index: Position of the log line in the table
+
+        Returns:
+            The headerless log line, in string form
+        """
+
+        offset = self.offsets[index]
+
+        return self.buffer[offset : offset + self.lengths[index]].decode("iso-8859-1")
+
+    def messages(self, indices: np.ndarray = None) -> list[str]:
+        """Decodes the messages of a group of log lines
+
+        Args:
+            indices: Array of positions of the log lines in the table (every log line if none is given)
+
+        Returns:
+            A list of the headerless log lines, in string form
+        """
+
+        offsets = self.offsets if indices is None else self.offsets[indices]
+        lengths = self.lengths if indices is None else self.lengths[indices]
+
+        return [
+            self.buffer[offset : offset + length].decode("iso-8859-1")
+            for offset, length in zip(offsets.tolist(), lengths.tolist())
+        ]
+
+    def find_lines(self, keyword: bytes) -> np.ndarray:
+        """Searches the buffer for a keyword and maps each occurrence to the log line that contains it
+
+        Args:
+            keyword: Keyword to be found, in bytes form
+
+        Returns:
+            Sorted array of the positions, in the table, of the log lines that contain the keyword
+        """
+
+        positions = []
+        position = self.buffer.find(keyword)
+
+        while position != -1:
+            positions.append(position)
+            position = self.buffer.find(keyword, position + 1)
+
+        positions = np.array(positions, dtype=np.int64)
+        line_indices = np.searchsorted(self.offsets, positions, side="right") - 1
+
+        # Occurrences that span two consecutive messages are not part of a single log line
+        inside_line = positions + len(keyword) <= self.offsets[line_indices] + self.lengths[line_indices]
+
+        return np.unique(line_indices[inside_line])
@@ -0,0 +1,83 @@
+import re
+import calendar
+from functools import lru_cache
+
+
+"""
+Global variables:
+    header_re: Compiled regular expression of the log line header, with the timestamp, host, process and pid as groups
+    months: Number of each month, by it's abbreviated name as written in the log header
+"""
+header_re = re.compile(
+    rb"([a-zA-Z]{3}\s[0-9]{2}\s[0-9]{2}:[0-9]{2}:[0-9]{2})\s(wt[1-4]tcs)\s(.+?)\[([0-9]+)\]:\s"
+)
+
+months = {
+    b"Jan": 1, b"Feb": 2, b"Mar": 3, b"Apr": 4, b"May": 5, b"Jun": 6,
+    b"Jul": 7, b"Aug": 8, b"Sep": 9, b"Oct": 10, b"Nov": 11, b"Dec": 12,
+}
+
+
+@lru_cache(maxsize=4096)
+def header_timestamp(stamp: bytes, date: str) -> int:
+    """Converts the timestamp of a log line header, which has no year, into Unix time. The year is taken from the night of the log
+    file, and moved when the log line belongs to a new (or previous) year
+
+    Args:
+        stamp: Timestamp of the log line header, as in "Oct 18 23:15:02"
+        date: Date, in string form, of the night of the log file
+
+    Returns:
+        Unix time, in seconds, of the log line header
+    """
+
+    night_year, night_month = int(date[0:4]), int(date[5:7])
+    month = months[stamp[0:3].capitalize()]
+
+    year = night_year
+
+    if month - night_month > 6:
+        year -= 1
+
+    elif night_month - month > 6:
+        year += 1
+
+    return calendar.timegm(
+        (year, month, int(stamp[4:6]), int(stamp[7:9]), int(stamp[10:12]), int(stamp[13:15]))
+    )
+
+
+def split_line(line: bytes, date: str, strip_header: bool = True) -> tuple:
+    """Splits a raw log line a single time into it's header fields and message, without decoding them
+
+    Args:
+        line: Raw log line, in bytes form
+        date: Date, in string form, of the night of the log file
+        strip_header: Flag for the removal of the header from the message
+
+    Returns:
+        A tuple with the Unix time (-1 if the line has no header), host, process, pid and message of the log line, in bytes form
+    """
+
+    header = header_re.search(line)
+
+    if header is None:
+        timestamp, host, process, pid = -1, b"", b"", -1
+
+    else:
+        timestamp = header_timestamp(header.group(1), date)
+        host = header.group(2)
+        process = header.group(3)
+        pid = int(header.group(4))
+
+    # Log line header removal and clearing of problematic characters
+    if strip_header and header is not None:
+        line = line[header.end() :]
+
+    message = line.rstrip(b"\r\n")
+
+    if strip_header:
+        message = message.replace(b"  ", b" ")
+
+    return timestamp, host, process, pid, message
+
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+"""
+Global variables:
+    query_path: Path of the query URL of the ESO raw database, which the stand-in archive answers
+"""
+query_path = "/wdb/wdb/eso/eso_archive_main/query"
+
+
+class ObsArchiveHandler(BaseHTTPRequestHandler):
+    """Request handler of a local stand-in of the ESO raw database, which answers each observation query with the CSV file recorded
+    for the queried night, so the fetch of observation files can be run and benchmarked without network access
+
+    Attributes:
+        records_folder: Relative path of the folder with the recorded CSV files, named by night (as in 2024-10-18.csv)
+        delay: Seconds that each answer is held back, to stand in for the time the archive takes to run the query
+    """
+
+    records_folder = "../files/obs_files"
+    delay = 0.0
+
+    def do_POST(self):
+        if self.path != query_path:
+            self.send_error(404, "Unknown query path")
+            return
+
+        # The query is a multipart form, with the night in one of it's fields
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        form = BytesParser(policy=HTTP).parsebytes(
+            "Content-Type: {0}\r\n\r\n".format(self.headers.get("Content-Type", "")).encode("utf-8") + body
+        )
+
+        night = None
+
+        if form.is_multipart():
+            for form_field in form.iter_parts():
+                if form_field.get_param("name", header="content-disposition") == "night":
+                    night = form_field.get_content().strip()
+
+        record_name = "{0}/{1}.csv".format(self.records_folder, night)
+
+        if night is None or not os.path.exists(record_name):
+            self.send_error(404, "No recorded observations for the night")
+            return
+
+        time.sleep(self.delay)
+
+        with open(record_name, "rb") as record_file:
+            record = record_file.read()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(record)))
+        self.end_headers()
+        self.wfile.write(record)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_obs_archive(records_folder: str, port: int = 0, delay: float = 0.0) -> tuple[ThreadingHTTPServer, str]:
+    """Starts a local stand-in of the ESO raw database, in a background thread, that answers the observation queries with the
+    recorded CSV files
+
+    Args:
+        records_folder: Relative path of the folder with the recorded CSV files, named by night
+        port: Port where the stand-in listens (any free one if 0)
+        delay: Seconds that each answer is held back
+
+    Returns:
+        A tuple with the running server (stopped with it's shutdown method) and the query URL to fetch from
+    """
+
+    handler = type("RecordsHandler", (ObsArchiveHandler,), {"records_folder": records_folder, "delay": delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, "http://127.0.0.1:{0}{1}".format(server.server_address[1], query_path)
+
+
+if __name__ == "__main__":
+    # As in: python -m modules.obs_archive_server ../files/obs_files 8000 1.5
+    server, url = serve_obs_archive(
+        sys.argv[1] if len(sys.argv) > 1 else ObsArchiveHandler.records_folder,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8000,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 0.0,
+    )
+
+    print("Serving recorded observations at ", url)
+
+    try:
+        threading.Event().wait()
+
+    except KeyboardInterrupt:
+        server.shutdown()
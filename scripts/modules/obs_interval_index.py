@@ -0,0 +1,126 @@
+import numpy as np
+
+
+class ObsIntervalIndex:
+    """Sorted, non overlapping time blocks of the valid observations of each instrument, in Unix time, used to test which log line
+    timestamps fit within said blocks
+
+    Attributes:
+        instruments: List of the observation instruments
+        starts: List of arrays, one by instrument, with the sorted start of each time block
+        stops: List of arrays, one by instrument, with the stop of each time block
+    """
+
+    __slots__ = ("instruments", "starts", "stops")
+
+    def __init__(self, instruments: list[str], starts: list[np.ndarray], stops: list[np.ndarray]):
+        self.instruments = instruments
+        self.starts = starts
+        self.stops = stops
+
+    @classmethod
+    def from_obs_list(
+        cls,
+        obs_list: list[list[str]],
+        lower_margin: float = 10.0,
+        upper_margin: float = 10.0,
+        join_threshold: float = 30.0,
+    ) -> "ObsIntervalIndex":
+        """Creates time blocks with TPL_START and EXPTIME by observation instrument, joining those that overlap (within the given
+        threshold) in a single sorted pass
+
+        Args:
+            obs_list: List of lists, with the observation instrument, it's respective timestamp and the exptime, in string form
+            lower_margin: Seconds added before the start of each time block
+            upper_margin: Seconds added after the stop of each time block
+            join_threshold: Maximum gap, in seconds, between two time blocks that are joined
+
+        Returns:
+            An ObsIntervalIndex with the joined time blocks
+        """
+
+        if len(obs_list) == 0:
+            return cls([], [], [])
+
+        tpl_instruments, tpl_dates, exptimes = zip(*obs_list)
+
+        tpl_starts = np.array(tpl_dates, dtype="datetime64[s]").astype(np.int64)
+        block_starts = tpl_starts - lower_margin
+        block_stops = tpl_starts + np.array(exptimes, dtype=np.float64) + upper_margin
+
+        instruments, instrument_codes = np.unique(np.array(tpl_instruments), return_inverse=True)
+
+        starts = []
+        stops = []
+
+        for instrument_code in range(len(instruments)):
+            instrument_mask = instrument_codes == instrument_code
+            instrument_starts = block_starts[instrument_mask]
+            instrument_stops = block_stops[instrument_mask]
+
+            order = np.lexsort((instrument_stops, instrument_starts))
+            instrument_starts = instrument_starts[order]
+            instrument_stops = np.maximum.accumulate(instrument_stops[order])
+
+            # A block opens a new joined block when it starts after the farthest stop so far (plus the threshold)
+            opens_block = np.ones(len(order), dtype=bool)
+            opens_block[1:] = instrument_starts[1:] - join_threshold > instrument_stops[:-1]
+
+            closes_block = np.ones(len(order), dtype=bool)
+            closes_block[:-1] = opens_block[1:]
+
+            starts.append(instrument_starts[opens_block])
+            stops.append(instrument_stops[closes_block])
+
+        return cls(instruments.tolist(), starts, stops)
+
+    def instrument_bits(self, timestamps: np.ndarray) -> np.ndarray:
+        """Tests which timestamps fit within the time blocks of each instrument, and packs the result as a bitmask
+
+        Args:
+            timestamps: Array of Unix times, in seconds
+
+        Returns:
+            An array of bitmasks, aligned with the timestamps, where bit n is set if the timestamp fits in a time block of the n-th
+            instrument
+        """
+
+        if len(self.instruments) > 64:
+            raise ValueError(
+                "Too many observation instruments for a bitmask: {0}".format(len(self.instruments))
+            )
+
+        bits = np.zeros(len(timestamps), dtype=np.uint64)
+
+        for instrument_bit, (starts, stops) in enumerate(zip(self.starts, self.stops)):
+            # Last block that starts at or before each timestamp
+            block_indices = np.searchsorted(starts, timestamps, side="right") - 1
+
+            instrument_mask = (block_indices >= 0) & (timestamps <= stops[np.maximum(block_indices, 0)])
+
+            bits[instrument_mask] |= np.uint64(1 << instrument_bit)
+
+        return bits
+
+    def instrument_labels(self, bits: np.ndarray) -> np.ndarray:
+        """Translates bitmasks of instruments into labels with the names of said instruments
+
+        Args:
+            bits: Array of bitmasks, as created by instrument_bits
+
+        Returns:
+            An array of labels, aligned with the bitmasks, with the names of the instruments joined by "|"
+        """
+
+        unique_bits, inverse = np.unique(bits, return_inverse=True)
+
+        unique_labels = [
+            "|".join(
+                instrument
+                for instrument_bit, instrument in enumerate(self.instruments)
+                if int(unique_bit) >> instrument_bit & 1
+            )
+            for unique_bit in unique_bits
+        ]
+
+        return np.array(unique_labels, dtype=object)[inverse]
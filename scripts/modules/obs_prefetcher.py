@@ -0,0 +1,96 @@
+import time
+import logging
+import requests
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+from modules.fetch_obs_file import fetch_obs_file
+
+
+class ObsPrefetcher:
+    """Background fetch of the observation files of several nights, with a bounded number of concurrent requests that share the
+    pooled connections of a single session, so the log stages of the nights already fetched can run while the rest are downloaded
+
+    Attributes:
+        session: Session shared by the requests, with as many pooled connections by host as concurrent requests
+        executor: Pool of threads that run the fetches
+        futures: Dictionary with the future of the fetch of each night, whose result is the one of fetch_obs_file
+        fetch_times: Dictionary with the seconds that the fetch of each night took, filled in as they finish
+    """
+
+    __slots__ = ("session", "executor", "futures", "fetch_times")
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        destination_folder: str,
+        nights: list[str],
+        max_workers: int = 4,
+        **fetch_args,
+    ):
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=max_workers))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max_workers))
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.fetch_times = {}
+
+        # Nights are submitted in order, so the first ones are fetched first
+        self.futures = {
+            night: self.executor.submit(self.fetch, logger, destination_folder, night, fetch_args) for night in nights
+        }
+
+    def fetch(self, logger: logging.Logger, destination_folder: str, night: str, fetch_args: dict) -> list[any]:
+        """Fetches the observation file of a night over the pooled connections, timing it
+
+        Args:
+            logger: Current script logging object
+            destination_folder: Relative path of the folder where the fetched CSV file is stored
+            night: Date of the CSV file to be fetched
+            fetch_args: Dictionary with the optional arguments of fetch_obs_file (profile, url, max_age and offline)
+
+        Returns:
+            List with the status code of the fetch and the observation rows, as returned by fetch_obs_file
+        """
+
+        fetch_start = time.time()
+
+        try:
+            return fetch_obs_file(logger, destination_folder, night, session=self.session, **fetch_args)
+
+        finally:
+            self.fetch_times[night] = time.time() - fetch_start
+
+    def future(self, night: str) -> Future:
+        """Gives the future of the fetch of a night, without waiting for it
+
+        Args:
+            night: Date of the CSV file
+
+        Returns:
+            The future of the fetch
+        """
+
+        return self.futures[night]
+
+    def result(self, night: str) -> list[any]:
+        """Waits only for the fetch of a night, while the others go on
+
+        Args:
+            night: Date of the CSV file
+
+        Returns:
+            List with the status code of the fetch and the observation rows, as returned by fetch_obs_file
+        """
+
+        return self.futures[night].result()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.session.close()
+
+    def __enter__(self) -> "ObsPrefetcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
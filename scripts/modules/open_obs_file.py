@@ -1,26 +1,64 @@
+import re
 import csv
+import logging
+from typing import Iterable, Iterator
+
+
+"""
+Global variables:
+    obs_columns: Names of the columns of the observation instrument (taken from the template id), timestamp and exptime, in upper
+        case and without separators, so "TPL ID", "TPL.ID" or "tpl_id" are the same column
+"""
+obs_columns = ["TPLID", "TPLSTART", "EXPTIME"]
 
-def open_obs_file(arch_name) -> list[list[str]]:
-    """Opens the VLT Observations CSV file and filters out the header and irrelevant fields
+
+def project_obs_rows(logger: logging.Logger, rows: Iterable[list[str]]) -> Iterator[list[str]]:
+    """Projects the rows of a VLT Observations CSV file, as they are read, into the fields of the observation time blocks, filtering
+    out the header and irrelevant fields. The columns are found by name in the header, so any query profile that has them works
 
     Args:
-        arch_name: CSV file relative path
+        logger: Current script logging object
+        rows: Iterable of the rows of the CSV file, as lists of fields
 
     Returns:
-        A list of lists, with each lists containing the observation instrument, it's respective timestamp and the exptime
+        An iterator of lists, with each list containing the observation instrument, it's respective timestamp and the exptime (none
+        if the file has no header with the columns, as the archive answers for a night without observations)
     """
 
-    tpl_list = []
+    rows = iter(rows)
+    column_indices = None
 
-    with open(arch_name, mode="r") as query:
-        reader = csv.reader(query)
+    # The rows before the header, if any, are skipped
+    for line in rows:
+        column_names = [re.sub(r"[^0-9A-Z]", "", column_name.upper()) for column_name in line]
+
+        if all(obs_column in column_names for obs_column in obs_columns):
+            column_indices = [column_names.index(obs_column) for obs_column in obs_columns]
+            break
+
+    if column_indices is None:
+        logger.info("Observations CSV file without the columns {0}".format(", ".join(obs_columns)))
+        return
+
+    tpl_id_index, tpl_start_index, exptime_index = column_indices
 
-        next(reader)
+    for line in rows:
+        if line[tpl_start_index] != "":
+            yield [line[tpl_id_index].split("_")[0], line[tpl_start_index], line[exptime_index]]
 
-        for line in reader:
-            if line[11] != "":
-                tpl_list.append([line[10].split("_")[0], line[11], line[12]])
 
-    tpl_list.pop(0)
+def open_obs_file(logger: logging.Logger, arch_name) -> list[list[str]]:
+    """Opens the VLT Observations CSV file and filters out the header and irrelevant fields
+
+    Args:
+        logger: Current script logging object
+        arch_name: CSV file relative path
+
+    Returns:
+        A list of lists, with each lists containing the observation instrument, it's respective timestamp and the exptime
+    """
+
+    with open(arch_name, mode="r") as query:
+        tpl_list = list(project_obs_rows(logger, csv.reader(query)))
 
-    return tpl_list
\ No newline at end of file
+    return tpl_list
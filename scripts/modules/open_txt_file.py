@@ -1,5 +1,56 @@
+import os
+import gzip
+import lzma
+from typing import IO, Iterator
+
+
+"""
+Global variables:
+    compressed_openers: Opening function of each compressed file extension, which decompresses the file as it's read
+"""
+compressed_openers = {".gz": gzip.open, ".xz": lzma.open}
+
+
+def open_raw_file(arch_name, mode: str = "rb", encoding: str = None) -> IO:
+    """Opens a file, either plain or compressed (as told by it's extension), so compressed files are decompressed while they are read
+    instead of beforehand
+
+    Args:
+        arch_name: File relative path
+        mode: Opening mode, either binary ("rb") or text ("r")
+        encoding: Encoding of the file, in text mode
+
+    Returns:
+        The opened file object
+    """
+
+    opener = compressed_openers.get(os.path.splitext(arch_name)[1])
+
+    if opener is None:
+        return open(file=arch_name, mode=mode, encoding=encoding)
+
+    return opener(arch_name, mode="rt" if mode == "r" else mode, encoding=encoding)
+
+
+def find_raw_file(arch_name) -> str:
+    """Finds a file, or it's compressed version if the plain one does not exist
+
+    Args:
+        arch_name: Uncompressed file relative path
+
+    Returns:
+        The relative path of the plain file, or of the first compressed one that exists (the plain one if none does)
+    """
+
+    for extension in ["", *compressed_openers]:
+        if os.path.exists(arch_name + extension):
+            return arch_name + extension
+
+    return arch_name
+
+
 def open_txt_file(arch_name) -> list[str]:
-    """Opens a text file and deposits it's information into a list
+    """Opens a text file, either plain or compressed, and deposits it's information into a list
 
     Args:
         arch_name: Text file relative path
@@ -8,7 +59,94 @@ def open_txt_file(arch_name) -> list[str]:
         A list with all the lines as strings
     """
 
-    with open(file=arch_name, mode="r", encoding="iso-8859-1") as logs:
+    with open_raw_file(arch_name, mode="r", encoding="iso-8859-1") as logs:
         lines = logs.readlines()
 
-    return lines
\ No newline at end of file
+    return lines
+
+
+def stream_raw_file(arch_name, buffer_size: int = 1048576, start: int = 0, stop: int = None) -> Iterator[bytes]:
+    """Opens a text file and lazily yields it's raw content in chunks that end at a line boundary, so only one chunk of the file is
+    held in memory at a time and no decoding is done before the lines are filtered. Compressed files are decompressed one chunk at
+    a time, and their positions are those of the decompressed content
+
+    Args:
+        arch_name: Text file relative path, either plain or compressed
+        buffer_size: Size, in bytes, of each read from the file
+        start: Position, in bytes, where the streamed range of the file starts (at a line boundary)
+        stop: Position, in bytes, where the streamed range of the file stops (at a line boundary, or the end of the file if none is
+            given)
+
+    Returns:
+        An iterator of bytes, with each containing the next chunk of whole lines
+    """
+
+    with open_raw_file(arch_name, mode="rb") as logs:
+        if start > 0:
+            logs.seek(start)
+
+        remaining = stop - start if stop is not None else -1
+        remainder = b""
+
+        while remaining != 0:
+            block = logs.read(buffer_size if remaining < 0 else min(buffer_size, remaining))
+
+            if not block:
+                break
+
+            if remaining > 0:
+                remaining -= len(block)
+
+            block = remainder + block
+            last_line_end = block.rfind(b"\n") + 1
+
+            # Keeps the incomplete last line for the next chunk
+            if last_line_end == 0:
+                remainder = block
+                continue
+
+            remainder = block[last_line_end:]
+
+            yield block[:last_line_end]
+
+        if remainder:
+            yield remainder
+
+
+def shard_raw_file(arch_name, num_shards: int) -> list[tuple[int, int]]:
+    """Splits a text file into byte ranges of about the same size, each one cut at a line boundary, so they can be processed apart.
+    Compressed files can't be read from the middle without decompressing all that comes before, so they are kept whole
+
+    Args:
+        arch_name: Text file relative path, either plain or compressed
+        num_shards: Number of byte ranges to split the file into
+
+    Returns:
+        A list of tuples with the start and stop, in bytes, of each range, in the order of the file (fewer ranges than requested if
+        the file has fewer lines, and a single range to the end of the file, with None as stop, if it's compressed)
+    """
+
+    if os.path.splitext(arch_name)[1] in compressed_openers:
+        return [(0, None)]
+
+    file_size = os.path.getsize(arch_name)
+    boundaries = [0]
+
+    with open(file=arch_name, mode="rb") as logs:
+        for shard_number in range(1, num_shards):
+            position = max(file_size * shard_number // num_shards, boundaries[-1])
+
+            if position >= file_size:
+                break
+
+            # Moves the cut forward, to the end of the line it falls in
+            logs.seek(position)
+            logs.readline()
+
+            if logs.tell() > boundaries[-1]:
+                boundaries.append(logs.tell())
+
+    if boundaries[-1] < file_size:
+        boundaries.append(file_size)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
@@ -12,17 +12,118 @@ def parse_args(args_list: list[str]) -> argparse.Namespace:
 
     parser = argparse.ArgumentParser()
 
-    parser.add_argument("date", type=str, help="Date to analyzed")
+    parser.add_argument("date", type=str, help="Date to analyzed (first date of the batch, if an end date is written)")
 
     parser.add_argument(
-        "ut", type=str, help="Number of the UT telescope to be analyzed"
+        "ut", type=str, help="Number of the UT telescope to be analyzed, or comma separated numbers of the UT telescopes of a batch (as in 1,2,3,4)"
+    )
+
+    parser.add_argument(
+        "-e",
+        "--enddate",
+        type=str,
+        help="Last date, included, of a batch of nights to be analyzed, each one for every UT telescope written",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes of a batch, each one analyzing a night and UT telescope at a time (1 by default)",
+    )
+
+    parser.add_argument(
+        "-d",
+        "--outputfolder",
+        type=str,
+        help="Path to the folder where the mid files and report are stored (../files/mid_files and the current folder by default, or a folder by night and UT telescope under ../files/batch in a batch)",
     )
 
     parser.add_argument(
         "-t",
         "--templatefile",
         type=str,
-        help="Path to the text file where the templates are stored (if no name is written, ./poc_templates.txt will be set by default)",
+        help="Path, with or without extension, to the file where the templates are stored, either declarative (.toml) or positional (.txt), with the .toml one preferred when no extension is written (if no name is written, ../files/templates/poc_templates will be set by default)",
+    )
+
+    parser.add_argument(
+        "-b",
+        "--buffersize",
+        type=int,
+        default=1048576,
+        help="Approximate size, in bytes, of each chunk of the raw log file streamed through the pipeline, extended to the next line boundary (1 MiB by default)",
+    )
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes, each one streaming a shard of the log file, cut at a line boundary, through the pre-processing, filtering and parsing stages (1 by default, which processes the whole file in the main process)",
+    )
+
+    parser.add_argument(
+        "-k",
+        "--keywordfilter",
+        action="store_false",
+        help="Skips keyword prefiltering stage: removal of the raw log lines without any of the keywords found in the templates, before they are decoded",
+    )
+
+    parser.add_argument(
+        "-m",
+        "--parser",
+        type=str,
+        choices=["regex", "batch"],
+        default="regex",
+        help="Log line parsing engine: regex parses the lines one by one, batch parses each chunk of lines as a column, with one vectorized pass by template (regex by default)",
+    )
+
+    parser.add_argument(
+        "-f",
+        "--fetchobs",
+        action="store_false",
+        help="Skips fetching of the observation files: use of the ones already stored in ../files/obs_files",
+    )
+
+    parser.add_argument(
+        "-u",
+        "--archiveurl",
+        type=str,
+        default="https://archive.eso.org/wdb/wdb/eso/eso_archive_main/query",
+        help="Query URL of the archive the observation files are fetched from, as a local stand-in served by modules/obs_archive_server.py (the ESO raw database by default)",
+    )
+
+    parser.add_argument(
+        "-q",
+        "--queryprofile",
+        type=str,
+        choices=["intervals", "full"],
+        default="intervals",
+        help="Archive query profile of the observation files: intervals asks only for the columns of the observation time blocks, full for every column of the archive (intervals by default)",
+    )
+
+    parser.add_argument(
+        "-x",
+        "--fetchconcurrency",
+        type=int,
+        default=4,
+        help="Maximum number of observation files of a batch fetched at the same time, over a shared pool of connections, while the nights already fetched are analyzed (4 by default)",
+    )
+
+    parser.add_argument(
+        "-n",
+        "--offline",
+        action="store_true",
+        help="Uses only the cached observation files, even if they are not fresh, without any request to the archive",
+    )
+
+    parser.add_argument(
+        "-a",
+        "--obsmaxage",
+        type=float,
+        default=3600.0,
+        help="Seconds that the cached observation file of a recent night is used before it's fetched again, where 0 always fetches recent nights (3600 by default, while the files of settled nights never expire)",
     )
 
     parser.add_argument(
@@ -0,0 +1,173 @@
+import calendar
+from datetime import time as dt_time
+from functools import lru_cache
+
+import numpy as np
+
+
+"""
+Global variables:
+    ns_per_second: Number of nanoseconds in a second
+    ns_per_day: Number of nanoseconds in a day
+    fraction_weights: Value, in nanoseconds, of each digit of the fractional seconds, up to nanoseconds
+"""
+ns_per_second = 1_000_000_000
+ns_per_day = 86_400 * ns_per_second
+
+fraction_weights = 10 ** np.arange(8, -1, -1, dtype=np.int64)
+
+
+@lru_cache(maxsize=131072)
+def parse_seconds(hms: str) -> int:
+    """Converts a HH:MM:SS time of day into nanoseconds since midnight. Log lines share their seconds, so the result is memoized
+
+    Args:
+        hms: Time of day, as in "23:15:02"
+
+    Returns:
+        Nanoseconds since midnight
+    """
+
+    return (int(hms[0:2]) * 3600 + int(hms[3:5]) * 60 + int(hms[6:8])) * ns_per_second
+
+
+def parse_time(time_str: str) -> int:
+    """Converts a HH:MM:SS[.ffffff] time of day, as written in the log lines, into nanoseconds since midnight, keeping the fractional
+    seconds
+
+    Args:
+        time_str: Time of day, as in "23:15:02" or "23:15:02.123456"
+
+    Returns:
+        Nanoseconds since midnight
+    """
+
+    nanoseconds = parse_seconds(time_str[0:8])
+
+    # Fractional seconds, of up to nine digits, after the separator
+    if len(time_str) > 9:
+        nanoseconds += int(time_str[9:18].ljust(9, "0"))
+
+    return nanoseconds
+
+
+@lru_cache(maxsize=1024)
+def parse_date(date_str: str) -> int:
+    """Converts a YYYY-MM-DD date into the Unix time, in nanoseconds, of it's midnight
+
+    Args:
+        date_str: Date, as in "2024-10-18"
+
+    Returns:
+        Nanoseconds since the Unix epoch
+    """
+
+    return calendar.timegm((int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10]), 0, 0, 0)) * ns_per_second
+
+
+def parse_time_column(times) -> np.ndarray:
+    """Converts a whole column of HH:MM:SS[.ffffff] times of day into nanoseconds since midnight, reading the digits of every time
+    at once from a fixed width byte array
+
+    Args:
+        times: Column (series, array or list) of times of day, in string form
+
+    Returns:
+        An array of nanoseconds since midnight, as int64
+    """
+
+    time_bytes = np.asarray(times, dtype="S18")
+
+    if len(time_bytes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    chars = time_bytes.view(np.uint8).reshape(len(time_bytes), -1).astype(np.int64)
+    digits = chars - ord("0")
+
+    seconds = (
+        (digits[:, 0] * 10 + digits[:, 1]) * 3600 + (digits[:, 3] * 10 + digits[:, 4]) * 60 + digits[:, 6] * 10 + digits[:, 7]
+    )
+
+    # Fractional seconds, where the padding after the last digit counts as zero
+    fraction_digits = digits[:, 9:18]
+    fraction_digits = np.where((fraction_digits >= 0) & (fraction_digits <= 9), fraction_digits, 0)
+
+    return seconds * ns_per_second + fraction_digits @ fraction_weights[: fraction_digits.shape[1]]
+
+
+def parse_date_column(dates) -> np.ndarray:
+    """Converts a whole column of YYYY-MM-DD dates into the Unix time, in nanoseconds, of their midnight
+
+    Args:
+        dates: Column (series, array or list) of dates, in string form
+
+    Returns:
+        An array of nanoseconds since the Unix epoch, as int64
+    """
+
+    return np.asarray(dates, dtype="datetime64[D]").astype("datetime64[ns]").astype(np.int64)
+
+
+@lru_cache(maxsize=131072)
+def time_of_day(nanoseconds: int) -> dt_time:
+    """Converts nanoseconds since midnight back into a time of day, kept to the microsecond
+
+    Args:
+        nanoseconds: Nanoseconds since midnight (wrapped around if it's a day or more)
+
+    Returns:
+        The time of day
+    """
+
+    microseconds = (nanoseconds % ns_per_day) // 1000
+
+    return dt_time(
+        microseconds // 3_600_000_000,
+        microseconds // 60_000_000 % 60,
+        microseconds // 1_000_000 % 60,
+        microseconds % 1_000_000,
+    )
+
+
+def absolute_time(nanoseconds: int, header_time: int, date: str) -> int:
+    """Places a time of day in the night of the log file, taking the day from the log line header when it's available, so log lines
+    written after midnight fall on the next day
+
+    Args:
+        nanoseconds: Nanoseconds since midnight of the time of day
+        header_time: Unix time, in seconds, of the log line header (-1 if the line has no header)
+        date: Date, in string form, of the night of the log file
+
+    Returns:
+        Unix time, in nanoseconds, of the day nearest to the header at the given time of day (or, without header, of the night's date
+        if the time is past noon, and of the next day otherwise)
+    """
+
+    if header_time >= 0:
+        day = (header_time * ns_per_second - nanoseconds + ns_per_day // 2) // ns_per_day * ns_per_day
+
+    else:
+        day = parse_date(date) + (ns_per_day if nanoseconds < ns_per_day // 2 else 0)
+
+    return day + nanoseconds
+
+
+def absolute_time_column(nanoseconds: np.ndarray, header_times: np.ndarray, date: str) -> np.ndarray:
+    """Places a whole column of times of day in the night of the log file, as absolute_time does for a single one
+
+    Args:
+        nanoseconds: Array of nanoseconds since midnight of the times of day
+        header_times: Array of Unix times, in seconds, of the log line headers (-1 if a line has no header)
+        date: Date, in string form, of the night of the log file
+
+    Returns:
+        An array of Unix times, in nanoseconds, as int64
+    """
+
+    nanoseconds = np.asarray(nanoseconds, dtype=np.int64)
+    header_times = np.asarray(header_times, dtype=np.int64)
+
+    header_days = (header_times * ns_per_second - nanoseconds + ns_per_day // 2) // ns_per_day * ns_per_day
+    night_days = parse_date(date) + np.where(nanoseconds < ns_per_day // 2, ns_per_day, 0)
+
+    return np.where(header_times >= 0, header_days, night_days) + nanoseconds
@@ -0,0 +1,174 @@
+import re
+import time
+import logging
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import Future
+
+from modules.open_txt_file import stream_raw_file
+from modules.log_prefilter import log_prefilter
+from modules.log_formatting import log_formatting
+from modules.obs_interval_index import ObsIntervalIndex
+from modules.obs_filtering import obs_filtering
+from modules.log_parsing import log_parsing_regex, log_parsing_batch
+from modules.template_registry import TemplateRegistry
+from modules.shared_future import SharedFuture
+
+
+"""
+Global variables:
+    tracking_time: Initialization of time for checkpoint monitoring
+    max_pending_chunks: Maximum number of chunks kept in memory while the observation time blocks are pending, after which the
+        reading waits for them
+"""
+tracking_time = time.time()
+
+max_pending_chunks = 16
+
+
+def process_log_shard(
+    logger: logging.Logger,
+    arch_name: str,
+    byte_range: tuple[int, int],
+    buffer_size: int,
+    date: str,
+    keyword_re: re.Pattern,
+    template_registry: TemplateRegistry,
+    pre_process_flag: bool,
+    obs_index: ObsIntervalIndex | Future | SharedFuture,
+    parser_engine: str,
+    pre_file_name: str,
+    obs_file_name: str,
+) -> list[any]:
+    """Streams a byte range of the log file, one chunk at a time, through the prefiltering, pre-processing, observation filtering
+    and parsing stages, where only the observation filtering waits for the observation time blocks. It's a module level function,
+    so it can be run as is in a worker process for each shard of the log file
+
+    Args:
+        logger: Current script logging object
+        arch_name: Log file relative path
+        byte_range: Tuple with the start and stop, in bytes, of the range of the log file, both at a line boundary (None as
+            stop streams it to the end of the file)
+        buffer_size: Size, in bytes, of each chunk of the log file
+        date: Date, in string format, of the night of the log file
+        keyword_re: Compiled search of the keywords that a log line must contain to be kept (no prefiltering if None)
+        template_registry: Registry of the compiled log line parsing templates
+        pre_process_flag: Flag for the removal of the log line headers
+        obs_index: Time blocks of the valid observations, or the future of them while they are being fetched, in which case up to
+            max_pending_chunks chunks are pre-processed and kept until they are ready (no observation filtering if none is given)
+        parser_engine: Log line parsing engine, either regex (line by line) or batch (vectorized by template)
+        pre_file_name: Text file relative path where the pre-processed log lines are written
+        obs_file_name: Text file relative path where the observation filtered log lines are written
+
+    Returns:
+        List with the number of lines read, pre-processed and filtered, the parsed data (a list of dictionaries for the regex
+        engine, a dataframe for the batch one) and the number of bytes read (after decompression, for compressed log files)
+    """
+
+    global tracking_time
+
+    ### Checkpoint - Start log shard processing
+    logger.info(
+        "Start log shard processing: {0} - Bytes: {1}-{2}".format(
+            str(time.time() - tracking_time), str(byte_range[0]), str(byte_range[1])
+        )
+    )
+    tracking_time = time.time()
+
+    parsed_data = []
+    parsed_frames = []
+
+    num_log_lines = 0
+    num_log_bytes = 0
+    num_pre_processed_lines = 0
+    num_obs_lines = 0
+
+    # Tables of pre-processed lines that wait for the observation time blocks, while they are pending
+    pending_tables = []
+    max_pending_tables = 0
+
+    with open(pre_file_name, "w", encoding="utf-8") as pre_file, open(obs_file_name, "w") as obs_file:
+        # The last None flushes the tables still pending at the end of the stream
+        for log_chunk in itertools.chain(stream_raw_file(arch_name, buffer_size, byte_range[0], byte_range[1]), [None]):
+            if log_chunk is not None:
+                num_log_lines += log_chunk.count(b"\n")
+                num_log_bytes += len(log_chunk)
+
+                #### Log lines' keyword prefiltering, before they are decoded
+                log_lines = log_prefilter(logger, log_chunk, keyword_re)
+
+                #### Log lines pre-processing, tokenizing each line once into the columns of a table
+                log_table = log_formatting(logger, log_lines, date, strip_header=pre_process_flag)
+
+                # Save pre-processed logs to file
+                for log_line in log_table.messages():
+                    pre_file.write("\t" + log_line + "\n")
+
+                num_pre_processed_lines += len(log_table)
+
+                pending_tables.append(log_table)
+                max_pending_tables = max(max_pending_tables, len(pending_tables))
+
+                # The next chunks are read while the time blocks are still being fetched, up to the pending limit
+                if (
+                    isinstance(obs_index, (Future, SharedFuture))
+                    and not obs_index.done()
+                    and len(pending_tables) < max_pending_chunks
+                ):
+                    continue
+
+            if isinstance(obs_index, (Future, SharedFuture)):
+                wait_start = time.time()
+                obs_index = obs_index.result()
+
+                logger.info(
+                    "Observation time blocks ready: Waited: {0} - Chunks read meanwhile: {1}".format(
+                        str(time.time() - wait_start), str(max_pending_tables)
+                    )
+                )
+
+            for log_table in pending_tables:
+                #### Log lines' observation filtering, as a single ordered array of positions in the table
+                obs_lines = np.arange(len(log_table))
+                obs_instruments = None
+
+                if obs_index is not None:
+                    obs_lines, obs_bits = obs_filtering(logger, log_table, obs_index)
+                    obs_instruments = obs_index.instrument_labels(obs_bits)
+
+                    # Save observation logs to file, tagged by instrument
+                    for obs_instrument, obs_line in zip(obs_instruments, log_table.messages(obs_lines)):
+                        obs_file.write("\t" + obs_instrument + "\t\t" + obs_line + "\n")
+
+                    num_obs_lines += len(obs_lines)
+
+                #### Log lines parsing
+                if parser_engine == "batch":
+                    parsed_frames.append(
+                        log_parsing_batch(logger, log_table, obs_lines, template_registry, obs_instruments)
+                    )
+
+                else:
+                    parsed_data.extend(
+                        log_parsing_regex(logger, log_table, obs_lines, template_registry, obs_instruments)
+                    )
+
+            pending_tables = []
+
+    if parser_engine == "batch":
+        # Chunks without parsed lines have no columns, so they are left out of the concatenation
+        parsed_frames = [parsed_frame for parsed_frame in parsed_frames if len(parsed_frame) > 0]
+        parsed_data = pd.concat(parsed_frames, ignore_index=True) if len(parsed_frames) > 0 else pd.DataFrame()
+
+    ### Checkpoint - End log shard processing
+    shard_time = time.time() - tracking_time
+
+    logger.info(
+        "End log shard processing: {0} - Lines read: {1} - Throughput: {2} MB/s".format(
+            str(shard_time), str(num_log_lines), str(num_log_bytes / 1e6 / max(shard_time, 1e-9))
+        )
+    )
+    tracking_time = time.time()
+
+    return [num_log_lines, num_pre_processed_lines, num_obs_lines, parsed_data, num_log_bytes]
@@ -1,20 +1,24 @@
+import numpy as np
 import pandas as pd
 
-def save_df_as_csv(df_list: list[pd.DataFrame], folder: str) -> None:
-    """Saves parsed data in an external CSV file
+def save_df_as_csv(df_list: list[pd.DataFrame | np.ndarray], folder: str) -> None:
+    """Saves parsed data in an external CSV file, and the matrix of forces in a NPY file, which can be loaded as a memory map
 
     Args:
-        df_list: List of the final dataframes
-        folder: Name or path of the folder to store the CSV files
+        df_list: List of the final dataframes, followed by the matrix of forces
+        folder: Name or path of the folder to store the CSV and NPY files
 
     Returns:
         None
     """
 
-    df_corrections, df_f_dist, df_images, df_additional_data = df_list
+    df_corrections, df_f_dist, df_images, df_additional_data, forces_matrix = df_list
 
     #### Save df in csv files
     df_f_dist.to_csv("{0}/df_f_dist.csv".format(folder), index=False)
     df_additional_data.to_csv("{0}/df_additional_data.csv".format(folder), index=False)
     df_corrections.to_csv("{0}/df_corrections.csv".format(folder), index=False)
-    df_images.to_csv("{0}/df_images.csv".format(folder), index=False)
\ No newline at end of file
+    df_images.to_csv("{0}/df_images.csv".format(folder), index=False)
+
+    #### Save forces matrix in npy file, with a row by force distribution (as in the forces_row column of df_f_dist)
+    np.save("{0}/forces.npy".format(folder), forces_matrix)
\ No newline at end of file
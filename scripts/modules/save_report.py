@@ -1,11 +1,14 @@
-def save_report(
-    log_lines: list[str], mid_files_list: list[list[any]], file_name: str
-) -> None:
+import pandas as pd
+
+from modules.log_parsing import parsed_records
+
+
+def save_report(mid_files_list: list[any], file_name: str) -> None:
     """Generates and stores report of the analyzed lines
 
     Args:
-        log_lines: List of the original log lines
-        mid_files_list: List of lists, each one with the results of intermediate algorithm steps
+        mid_files_list: List with the number of lines read, pre-processed and filtered, followed by the parsed data (as a list of
+            dictionaries or a dataframe)
         file_name: Name of the report file
 
     Returns:
@@ -13,9 +16,7 @@ def save_report(
     """
 
     # Denormalizing lists
-    _, _, parsed_lines = mid_files_list
-
-    num_log_lines = len(log_lines)
+    num_log_lines, _, _, parsed_lines = mid_files_list
 
     num_parsed_lines = len(parsed_lines)
 
@@ -23,6 +24,9 @@ def save_report(
     num_img_lines = 0
     num_forces_lines = 0
 
+    if isinstance(parsed_lines, pd.DataFrame):
+        parsed_lines = parsed_records(parsed_lines)
+
     for line in parsed_lines:
         if line["group"] == "INIT":
             num_corr_lines += 1
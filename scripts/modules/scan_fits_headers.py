@@ -0,0 +1,187 @@
+import time
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from astropy.io import fits
+from astropy.io.fits.verify import VerifyError
+
+from modules.open_txt_file import open_raw_file
+
+
+"""
+Global variables:
+    tracking_time: Initialization of time for checkpoint monitoring
+    header_keys: FITS header keywords of the exposure number, integration time and observation date of an image
+"""
+tracking_time = time.time()
+
+header_keys = ("HIERARCH ESO DET EXP NO", "EXPTIME", "DATE-OBS")
+
+
+def read_fits_header(img_path: str) -> tuple:
+    """Reads the primary header of a FITS file, and only it's header blocks, without opening the HDU list or mapping the data.
+    Gzipped files are decompressed only up to the end of the header, and the keywords missing from a dataless primary header (as
+    in tile compressed .fz files, which keep the image in the first extension) are read from the header of the first extension
+
+    Args:
+        img_path: FITS file relative path, either plain, gzipped or tile compressed
+
+    Returns:
+        A tuple with the exposure number, integration time and observation date of the image (None for the keywords the header
+        does not have), or None if the file can't be read as FITS or it's keywords don't have the expected types
+    """
+
+    try:
+        with open_raw_file(img_path, mode="rb") as img_file:
+            header = fits.Header.fromfile(img_file)
+            header_values = [header.get(header_key) for header_key in header_keys]
+
+            if None in header_values and header.get("NAXIS", 0) == 0 and header.get("EXTEND", False):
+                extension_header = fits.Header.fromfile(img_file)
+
+                header_values = [
+                    extension_header.get(header_key) if header_value is None else header_value
+                    for header_key, header_value in zip(header_keys, header_values)
+                ]
+
+        exp_no, exptime, date_obs = header_values
+
+        return (
+            int(exp_no) if exp_no is not None else None,
+            float(exptime) if exptime is not None else None,
+            str(date_obs) if date_obs is not None else None,
+        )
+
+    # Malformed headers raise astropy's VerifyError, or a KeyError on some odd cards, instead of the usual read errors
+    except (OSError, EOFError, ValueError, TypeError, KeyError, VerifyError):
+        return None
+
+
+def scan_fits_headers(
+    logger: logging.Logger, img_folder: str, index_name: str, workers: int = None
+) -> list[tuple]:
+    """Scans the primary headers of the FITS files of a folder, and of it's subfolders, across a pool of threads, keeping them in a
+    SQLite index by path, modification time and size, so the files that have not changed since the last scan are not read again
+    (the files that can't be read as FITS are kept in the index too, so they are not read again until they change)
+
+    Args:
+        logger: Current script logging object
+        img_folder: Folder relative path of the FITS files, either plain or compressed
+        index_name: SQLite file relative path of the header index
+        workers: Number of threads that read the headers (the thread pool default if None)
+
+    Returns:
+        A list of tuples, in the order of the folder listing, with the file path (relative to img_folder), exposure number,
+        integration time and observation date of each image (the files that can't be read as FITS are left out, and logged)
+    """
+
+    global tracking_time
+
+    ### Checkpoint - Start scan fits headers
+    logger.info("Start scan fits headers: {0}".format(str(time.time() - tracking_time)))
+    tracking_time = time.time()
+
+    if not os.path.isdir(img_folder):
+        logger.warning("Fits folder not found, no images to scan: {0}".format(img_folder))
+
+    img_files = []
+
+    for folder_path, _, file_names in os.walk(img_folder):
+        for file_name in file_names:
+            img_path = os.path.join(folder_path, file_name)
+            img_stat = os.stat(img_path)
+
+            img_files.append(
+                (
+                    os.path.relpath(img_path, img_folder),
+                    os.path.abspath(img_path),
+                    img_stat.st_mtime_ns,
+                    img_stat.st_size,
+                )
+            )
+
+    connection = sqlite3.connect(index_name, timeout=60)
+
+    try:
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS fits_headers "
+            "(path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, exp_no INTEGER, exptime REAL, date_obs TEXT)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS unreadable_files (path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER)"
+        )
+
+        indexed_headers = {
+            img_path: (img_mtime, img_size, (exp_no, exptime, date_obs))
+            for img_path, img_mtime, img_size, exp_no, exptime, date_obs in connection.execute(
+                "SELECT path, mtime, size, exp_no, exptime, date_obs FROM fits_headers"
+            )
+        }
+
+        unreadable_files = {
+            img_path: (img_mtime, img_size)
+            for img_path, img_mtime, img_size in connection.execute("SELECT path, mtime, size FROM unreadable_files")
+        }
+
+        # Files that are new, or have changed since they were indexed (either as FITS files or as unreadable ones)
+        stale_files = [
+            (img_path, img_mtime, img_size)
+            for _, img_path, img_mtime, img_size in img_files
+            if indexed_headers.get(img_path, (None, None))[0:2] != (img_mtime, img_size)
+            and unreadable_files.get(img_path) != (img_mtime, img_size)
+        ]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            stale_headers = list(executor.map(read_fits_header, [img_path for img_path, _, _ in stale_files]))
+
+        new_headers = [
+            (img_path, img_mtime, img_size, img_header)
+            for (img_path, img_mtime, img_size), img_header in zip(stale_files, stale_headers)
+            if img_header is not None
+        ]
+
+        # Files that can't be read as FITS are indexed apart, so they are tried again only once they change
+        new_unreadable_files = [
+            (img_path, img_mtime, img_size)
+            for (img_path, img_mtime, img_size), img_header in zip(stale_files, stale_headers)
+            if img_header is None
+        ]
+
+        for img_path, _, _ in new_unreadable_files:
+            logger.info("Skipped fits file: {0}".format(img_path))
+
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO fits_headers VALUES (?, ?, ?, ?, ?, ?)",
+                [(img_path, img_mtime, img_size, *img_header) for img_path, img_mtime, img_size, img_header in new_headers],
+            )
+            connection.executemany(
+                "DELETE FROM unreadable_files WHERE path = ?", [(img_path,) for img_path, _, _, _ in new_headers]
+            )
+            connection.executemany("INSERT OR REPLACE INTO unreadable_files VALUES (?, ?, ?)", new_unreadable_files)
+
+    finally:
+        connection.close()
+
+    for img_path, img_mtime, img_size, img_header in new_headers:
+        indexed_headers[img_path] = (img_mtime, img_size, img_header)
+
+    img_headers = [
+        (img_name, *indexed_headers[img_path][2])
+        for img_name, img_path, img_mtime, img_size in img_files
+        if img_path in indexed_headers and indexed_headers[img_path][0:2] == (img_mtime, img_size)
+    ]
+
+    ### Checkpoint - End scan fits headers
+    logger.info(
+        "End scan fits headers: {0} - Files: {1} - Read: {2} - Skipped: {3}".format(
+            str(time.time() - tracking_time),
+            str(len(img_files)),
+            str(len(stale_files)),
+            str(len(new_unreadable_files)),
+        )
+    )
+    tracking_time = time.time()
+
+    return img_headers
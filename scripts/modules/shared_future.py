@@ -0,0 +1,58 @@
+from concurrent.futures import Future
+from multiprocessing.managers import SyncManager
+
+
+class SharedFuture:
+    """Result of a future of the main process, shared with the worker processes through a manager, so the workers can start their
+    work while it's pending and only wait for it when they need it. It has the done and result methods of a future
+
+    Attributes:
+        ready: Event of the manager, set once the future is finished
+        outcome: Dictionary of the manager, with the result or the exception of the future once it's finished
+    """
+
+    __slots__ = ("ready", "outcome")
+
+    def __init__(self, manager: SyncManager, future: Future):
+        self.ready = manager.Event()
+        self.outcome = manager.dict()
+
+        future.add_done_callback(self.settle)
+
+    def settle(self, future: Future):
+        """Shares the outcome of the future, once it's finished, with the worker processes
+
+        Args:
+            future: The finished future
+        """
+
+        if future.exception() is not None:
+            self.outcome["exception"] = future.exception()
+
+        else:
+            self.outcome["result"] = future.result()
+
+        self.ready.set()
+
+    def done(self) -> bool:
+        """Checks, without waiting, if the future is finished
+
+        Returns:
+            True if the outcome of the future is already shared
+        """
+
+        return self.ready.is_set()
+
+    def result(self) -> any:
+        """Waits for the future to finish
+
+        Returns:
+            The result of the future (it's exception is raised instead, if it failed)
+        """
+
+        self.ready.wait()
+
+        if "exception" in self.outcome:
+            raise self.outcome["exception"]
+
+        return self.outcome["result"]
@@ -0,0 +1,412 @@
+import re
+import hashlib
+import tomllib
+import numpy as np
+
+from modules.open_txt_file import open_txt_file
+from modules.log_prefilter import template_words
+from modules.parse_timestamp import parse_time, parse_date
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+"""
+Global variables:
+    group_name_re: Compiled regular expression of the opening of a named group, in a template
+    legacy_layouts: Target dataframe, constant fields and typed fields (by group number) of the templates in each position of a
+        positional text file (the templates from the last position onwards are the additional data ones)
+"""
+group_name_re = re.compile(r"(?<!\\)\(\?P<[A-Za-z_][A-Za-z0-9_]*>")
+
+legacy_layouts = [
+    ("f_dist", {"group": "FORCES", "label": "f_dist"}, {"date": (2, "date"), "time": (3, "time"), "data": (6, "floats")}),
+    ("f_dist", {"group": "FORCES", "label": "f_id"}, {"date": (2, "date"), "time": (3, "time"), "data": (5, "int")}),
+    ("corrections", {"group": "INIT"}, {"time": (3, "time"), "data": (5, "int")}),
+    ("images", {"group": "IMAGE"}, {"time": (2, "time"), "label": (5, "str"), "data": (4, "int")}),
+    ("images", {"group": "IMAGE"}, {"time": (2, "time"), "label": (4, "str"), "data": (5, "int")}),
+    ("additional_data", {}, {"time": (2, "time"), "group": (4, "str"), "label": (5, "str"), "data": (6, "str")}),
+]
+
+
+def parse_floats(value: str) -> np.ndarray:
+    """Converts a whitespace separated list of numbers into floats, in a single vectorized conversion
+
+    Args:
+        value: Numbers, in string form
+
+    Returns:
+        An array with the numbers as float64
+    """
+
+    return np.array(value.split(), dtype=np.float64)
+
+
+def has_backreference(parsed_pattern) -> bool:
+    """Walks a parsed regular expression looking for references to it's groups, either backreferences (numbered or named) or
+    conditionals on a group, whose numbers are shifted once the template is joined into the dispatch alternation
+
+    Args:
+        parsed_pattern: Regular expression, as parsed by the re module's parser, or any of it's nested arguments
+
+    Returns:
+        True if the regular expression refers to any of it's groups
+    """
+
+    for item in parsed_pattern:
+        if isinstance(item, tuple) and len(item) == 2 and item[0] in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+            return True
+
+        if isinstance(item, (tuple, list, sre_parse.SubPattern)) and has_backreference(item):
+            return True
+
+    return False
+
+
+class TemplateRegistry:
+    """Log line parsing templates, loaded and compiled a single time into typed extractors
+
+    Attributes:
+        arch_name: File relative path of the templates
+        names: List of the names of the templates
+        templates: List of the log line parsing templates, in string form
+        patterns: List of the compiled templates, aligned with templates
+        template_ids: List of the stable ids of the templates, taken from their content, aligned with templates
+        targets: List of the dataframe each template's data goes to (f_dist, corrections, images or additional_data)
+        keywords: List of lists, one by template, of the words that any line matching the template must contain (each one is
+            checked to be a required word of it's template)
+        constants: List of dictionaries, one by template, of the fields with a fixed value
+        extractors: List of lists, one by template, of tuples with the name, group number and type converter of each field
+        dispatch_pattern: Compiled alternation of every template, each wrapped in a named group, used to find the matching template
+            and it's groups in a single scan of a log line
+        dispatch_groups: List of the number, in dispatch_pattern, of the group that wraps each template
+        dispatch_templates: Dictionary with the position of each template, by the number of the group that wraps it
+    """
+
+    __slots__ = (
+        "arch_name",
+        "names",
+        "templates",
+        "patterns",
+        "template_ids",
+        "targets",
+        "keywords",
+        "constants",
+        "extractors",
+        "dispatch_pattern",
+        "dispatch_groups",
+        "dispatch_templates",
+    )
+
+    """
+    Class variables:
+        targets_list: Dataframes the parsed data can go to
+        field_types: Converter of each field type, from the matched string to the typed value (time into nanoseconds since midnight,
+            and date into the Unix time, in nanoseconds, of it's midnight)
+        min_templates: Minimum number of templates of a positional text file
+    """
+    targets_list = ["f_dist", "corrections", "images", "additional_data"]
+
+    field_types = {
+        "str": str,
+        "int": int,
+        "float": float,
+        "floats": parse_floats,
+        "time": parse_time,
+        "date": parse_date,
+    }
+
+    min_templates = len(legacy_layouts) - 1
+
+    def __init__(
+        self,
+        arch_name: str,
+        names: list[str],
+        templates: list[str],
+        targets: list[str],
+        keywords: list[list[str]],
+        constants: list[dict],
+        fields: list[dict],
+    ):
+        self.arch_name = arch_name
+        self.names = names
+        self.templates = templates
+        self.targets = targets
+        self.constants = constants
+
+        self.keywords = []
+
+        self.patterns = []
+        self.template_ids = []
+        self.extractors = []
+
+        for template_index, template in enumerate(templates):
+            try:
+                pattern = re.compile(template)
+
+            except re.error as error:
+                raise ValueError(
+                    "Template {0} of {1} is not a valid regular expression: {2}".format(
+                        names[template_index], arch_name, error
+                    )
+                )
+
+            if has_backreference(sre_parse.parse(template)):
+                raise ValueError(
+                    "Template {0} of {1} has a backreference, which is not supported".format(
+                        names[template_index], arch_name
+                    )
+                )
+
+            # Flags set for the whole template would apply to every template of the dispatch alternation
+            if pattern.flags & ~re.UNICODE:
+                raise ValueError(
+                    "Template {0} of {1} has a global inline flag, which is not supported".format(
+                        names[template_index], arch_name
+                    )
+                )
+
+            # The keywords route and prefilter the lines, so a keyword that a matching line may lack would drop it silently
+            words = template_words(template)
+
+            if keywords[template_index] is None:
+                self.keywords.append(words)
+
+            else:
+                for keyword in keywords[template_index]:
+                    if keyword not in words:
+                        raise ValueError(
+                            "Template {0} of {1} has a keyword that is not one of it's required words: {2}".format(
+                                names[template_index], arch_name, keyword
+                            )
+                        )
+
+                self.keywords.append(keywords[template_index])
+
+            if targets[template_index] not in self.targets_list:
+                raise ValueError(
+                    "Template {0} of {1} has an unknown target: {2}".format(
+                        names[template_index], arch_name, targets[template_index]
+                    )
+                )
+
+            extractor = []
+
+            for field_name, (field_group, field_type) in fields[template_index].items():
+                # Named groups are resolved to their number, which is kept in the dispatch alternation
+                if isinstance(field_group, str):
+                    field_group = pattern.groupindex.get(field_group, -1)
+
+                if not 0 <= field_group <= pattern.groups:
+                    raise ValueError(
+                        "Template {0} of {1} has no group for the field {2}".format(
+                            names[template_index], arch_name, field_name
+                        )
+                    )
+
+                if field_type not in self.field_types:
+                    raise ValueError(
+                        "Template {0} of {1} has an unknown type for the field {2}: {3}".format(
+                            names[template_index], arch_name, field_name, field_type
+                        )
+                    )
+
+                extractor.append((field_name, field_group, self.field_types[field_type]))
+
+            self.patterns.append(pattern)
+            self.template_ids.append(hashlib.sha1(template.encode("utf-8")).hexdigest()[:12])
+            self.extractors.append(extractor)
+
+        # Templates earlier in the file take precedence when two of them match at the same position. Group names are dropped, so
+        # the same field can be named in several templates, while the group numbers stay the same
+        self.dispatch_pattern = re.compile(
+            "|".join(
+                "(?P<template_{0}>{1})".format(template_index, group_name_re.sub("(", template))
+                for template_index, template in enumerate(templates)
+            )
+        )
+        self.dispatch_groups = [
+            self.dispatch_pattern.groupindex["template_{0}".format(template_index)]
+            for template_index in range(len(templates))
+        ]
+        self.dispatch_templates = {
+            dispatch_group: template_index for template_index, dispatch_group in enumerate(self.dispatch_groups)
+        }
+
+    @classmethod
+    def load(cls, arch_name: str) -> "TemplateRegistry":
+        """Opens the templates file, either declarative (.toml) or positional (any other extension), and compiles and checks each
+        of it's templates
+
+        Args:
+            arch_name: File relative path of the templates
+
+        Returns:
+            A TemplateRegistry with the compiled templates
+        """
+
+        if arch_name.endswith(".toml"):
+            return cls.load_toml(arch_name)
+
+        return cls.load_txt(arch_name)
+
+    @classmethod
+    def load_toml(cls, arch_name: str) -> "TemplateRegistry":
+        """Opens a declarative templates file, where each template names it's groups and declares it's target dataframe, field
+        types and keywords (the required words of it's pattern if it declares none)
+
+        Args:
+            arch_name: TOML file relative path of the templates
+
+        Returns:
+            A TemplateRegistry with the compiled templates
+        """
+
+        try:
+            with open(arch_name, "rb") as tplt_file:
+                tplt_list = tomllib.load(tplt_file).get("template", [])
+
+        except tomllib.TOMLDecodeError as error:
+            raise ValueError("{0} is not a valid TOML file: {1}".format(arch_name, error))
+
+        names = []
+
+        for template_number, template in enumerate(tplt_list, start=1):
+            for key in ["name", "pattern", "target"]:
+                if key not in template:
+                    raise ValueError(
+                        "Template number {0} of {1} has no {2}".format(template_number, arch_name, key)
+                    )
+
+            if template["name"] in names:
+                raise ValueError("{0} has two templates named {1}".format(arch_name, template["name"]))
+
+            names.append(template["name"])
+
+        if len(tplt_list) == 0:
+            raise ValueError("{0} has no templates".format(arch_name))
+
+        return cls(
+            arch_name,
+            names,
+            [template["pattern"] for template in tplt_list],
+            [template["target"] for template in tplt_list],
+            [template.get("keywords") for template in tplt_list],
+            [template.get("constants", {}) for template in tplt_list],
+            [
+                {
+                    field_name: (field_name, field_type)
+                    for field_name, field_type in template.get("fields", {}).items()
+                }
+                for template in tplt_list
+            ],
+        )
+
+    @classmethod
+    def load_txt(cls, arch_name: str) -> "TemplateRegistry":
+        """Opens a positional templates text file, with one template by line, where the position of each template gives it's
+        target dataframe and the group number of each field
+
+        Args:
+            arch_name: Text file relative path of the templates
+
+        Returns:
+            A TemplateRegistry with the compiled templates
+        """
+
+        names = []
+        templates = []
+        layouts = []
+
+        for line_number, template in enumerate(open_txt_file(arch_name), start=1):
+            template = template.replace("\n", "")
+
+            if template == "":
+                continue
+
+            try:
+                words = template_words(template)
+
+            except re.error as error:
+                raise ValueError(
+                    "Template in line {0} of {1} is not a valid regular expression: {2}".format(
+                        line_number, arch_name, error
+                    )
+                )
+
+            names.append("line_{0}".format(line_number))
+            templates.append(template)
+            layouts.append((legacy_layouts[min(len(layouts), len(legacy_layouts) - 1)], words))
+
+        if len(templates) < cls.min_templates:
+            raise ValueError(
+                "{0} has {1} templates, but at least {2} are needed".format(arch_name, len(templates), cls.min_templates)
+            )
+
+        return cls(
+            arch_name,
+            names,
+            templates,
+            [target for (target, _, _), _ in layouts],
+            [words for _, words in layouts],
+            [dict(constants) for (_, constants, _), _ in layouts],
+            [fields for (_, _, fields), _ in layouts],
+        )
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def match(self, line: str) -> tuple:
+        """Finds the template that matches a log line, and it's groups, in a single scan
+
+        Args:
+            line: Headerless log line, in string form
+
+        Returns:
+            A tuple with the position of the matching template and the tuple of it's groups, numbered as in the template (group 0 is
+            the whole match), or None if no template matches
+        """
+
+        match = self.dispatch_pattern.search(line)
+
+        if match is None:
+            return None
+
+        # The group that wraps the matching template is the last one to close
+        dispatch_group = match.lastindex
+        template_index = self.dispatch_templates[dispatch_group]
+
+        # Built one group at a time, as match.group gives a single string instead of a tuple for a template without groups
+        return template_index, tuple(
+            match.group(group)
+            for group in range(dispatch_group, dispatch_group + self.patterns[template_index].groups + 1)
+        )
+
+    def parse(self, line: str) -> tuple:
+        """Finds the template that matches a log line and extracts it's fields, already converted to their declared types
+
+        Args:
+            line: Headerless log line, in string form
+
+        Returns:
+            A tuple with the position of the matching template and a dictionary with the constant and extracted fields (None for the
+            groups that did not take part in the match), or None if no template matches
+        """
+
+        match = self.dispatch_pattern.search(line)
+
+        if match is None:
+            return None
+
+        dispatch_group = match.lastindex
+        template_index = self.dispatch_templates[dispatch_group]
+
+        result = dict(self.constants[template_index])
+
+        for field_name, field_group, field_converter in self.extractors[template_index]:
+            value = match.group(dispatch_group + field_group)
+            result[field_name] = field_converter(value) if value is not None else None
+
+        return template_index, result
@@ -0,0 +1,137 @@
+import time
+import logging
+import numpy as np
+import pandas as pd
+
+
+"""
+Global variables:
+    tracking_time: Initialization of time for checkpoint monitoring
+"""
+tracking_time = time.time()
+
+
+def bracketed_mask(f_dist_times: np.ndarray, img_times: np.ndarray) -> np.ndarray:
+    """Tests which force distributions are bracketed by a pair of consecutive images, in a single merge-sweep over the sorted times,
+    where each pair of images is consumed by the force distribution it brackets (so the images around it become consecutive)
+
+    Args:
+        f_dist_times: Array of force distribution times, as datetime64[ns] (NaT is never bracketed)
+        img_times: Sorted array of image exposition starts, as datetime64[ns], without NaT
+
+    Returns:
+        A boolean array, aligned with f_dist_times, that is True for the bracketed force distributions
+    """
+
+    f_dist_valid = ~np.isnat(f_dist_times)
+    f_dist_times = f_dist_times.astype(np.int64)
+
+    img_times_buffer = img_times.astype(np.int64).tolist()
+
+    keep_mask = np.zeros(len(f_dist_times), dtype=bool)
+
+    # The images before the current force distribution are stacked, so the top of the stack and the image at img_times_index are
+    # the remaining pair of consecutive images around it
+    img_times_stack = []
+    img_times_index = 0
+
+    for f_dist_index in np.argsort(f_dist_times, kind="stable").tolist():
+        if not f_dist_valid[f_dist_index]:
+            continue
+
+        f_dist_time = f_dist_times[f_dist_index]
+
+        while img_times_index < len(img_times_buffer) and img_times_buffer[img_times_index] < f_dist_time:
+            img_times_stack.append(img_times_buffer[img_times_index])
+            img_times_index += 1
+
+        if (
+            len(img_times_stack) > 0
+            and img_times_index < len(img_times_buffer)
+            and f_dist_time < img_times_buffer[img_times_index]
+        ):
+            keep_mask[f_dist_index] = True
+
+            img_times_stack.pop()
+            img_times_index += 1
+
+    return keep_mask
+
+
+def validate_all(
+    logger: logging.Logger, df_corrections: pd.DataFrame, df_f_dist: pd.DataFrame, df_images: pd.DataFrame
+) -> list[any]:
+    """Validates the images, force distributions and corrections dataframes in a single stage: images need an id, force
+    distributions need a pair of consecutive images around them, and corrections need one of those force distributions. Each table is
+    sorted a single time by it's time column, the three validations are run as masks over the sorted arrays, and each dataframe is
+    taken from it's rows once, already in order
+
+    Args:
+        logger: Current script logging object
+        df_corrections: Dataframe of timestamps of corrections
+        df_f_dist: Dataframe of force distributions
+        df_images: Dataframe of images
+
+    Returns:
+        List with the valid corrections, force distributions and images dataframes, followed by a dictionary with the number of rows
+        dropped by each validation rule
+    """
+
+    global tracking_time
+
+    ### Checkpoint - Start validate all
+    logger.info("Start validate all: {0}".format(str(time.time() - tracking_time)))
+    tracking_time = time.time()
+
+    #### Images with id, sorted by exposition start (images without it go last)
+    img_times = df_images["exposition_start"].to_numpy(dtype="datetime64[ns]")
+    img_order = np.argsort(img_times, kind="stable")
+
+    img_mask = df_images["id_img"].notna().to_numpy()[img_order]
+    img_rows = img_order[img_mask]
+
+    #### Force distributions bracketed by a pair of the valid images, sorted by timestamp
+    f_dist_times = df_f_dist["timestamp"].to_numpy(dtype="datetime64[ns]")
+    f_dist_order = np.argsort(f_dist_times, kind="stable")
+
+    valid_img_times = img_times[img_rows]
+    valid_img_times = valid_img_times[~np.isnat(valid_img_times)]
+
+    f_dist_mask = bracketed_mask(f_dist_times[f_dist_order], valid_img_times)
+    f_dist_rows = f_dist_order[f_dist_mask]
+
+    #### Corrections that are followed by one of the valid force distributions, sorted by timestamp
+    corr_times = df_corrections["timestamp"].to_numpy(dtype="datetime64[ns]")
+    corr_order = np.argsort(corr_times, kind="stable")
+
+    f_dist_ids = df_f_dist["id_f_dist"].to_numpy()[f_dist_rows]
+
+    corr_mask = df_corrections["id_f_dist_new"].isin(f_dist_ids).to_numpy()[corr_order]
+    corr_rows = corr_order[corr_mask]
+
+    #### Valid dataframes, taken in a single pass each
+    nu_df_images = df_images.take(img_rows)
+    nu_df_images.index = pd.RangeIndex(len(img_rows))
+
+    nu_df_f_dist = df_f_dist.take(f_dist_rows)
+    nu_df_f_dist.index = pd.RangeIndex(len(f_dist_rows))
+
+    nu_df_corrections = df_corrections.take(corr_rows)
+    nu_df_corrections.index = pd.RangeIndex(len(corr_rows))
+
+    drop_counts = {
+        "images_without_id": int(len(img_order) - len(img_rows)),
+        "f_dist_without_images": int(len(f_dist_order) - len(f_dist_rows)),
+        "corrections_without_f_dist": int(len(corr_order) - len(corr_rows)),
+    }
+
+    ### Checkpoint - End validate all
+    logger.info(
+        "End validate all: {0} - Dropped rows: {1}".format(
+            str(time.time() - tracking_time),
+            ", ".join("{0} {1}".format(rule, str(count)) for rule, count in drop_counts.items()),
+        )
+    )
+    tracking_time = time.time()
+
+    return [nu_df_corrections, nu_df_f_dist, nu_df_images, drop_counts]
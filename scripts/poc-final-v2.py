@@ -2,27 +2,34 @@ from datetime import datetime
 import json
 import time
 import logging
+import numpy as np
 import pandas as pd
 import csv
 import argparse
 import sys
-
-from modules.open_txt_file import open_txt_file
-from modules.log_formatting import log_formatting
-from modules.fetch_obs_file import fetch_obs_file
+import os
+import shutil
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import Manager
+
+from modules.open_txt_file import find_raw_file, shard_raw_file
+from modules.log_prefilter import template_keywords, keywords_pattern
+from modules.fetch_obs_file import fetch_obs_file, archive_url, cache_max_age
 from modules.open_obs_file import open_obs_file
-from modules.obs_filtering import obs_filtering
-from modules.log_parsing import log_parsing_regex
+from modules.obs_interval_index import ObsIntervalIndex
+from modules.process_log_shard import process_log_shard
+from modules.shared_future import SharedFuture
+from modules.log_parsing import parsed_records
+from modules.template_registry import TemplateRegistry
 from modules.generate_dataframes import generate_dataframes
-from modules.validate_images import validate_images
-from modules.validate_forces import validate_forces
+from modules.validate_all import validate_all
 from modules.link_images import link_images
-from modules.validate_corrections import validate_corrections
 from modules.link_dataframes import link_dataframes
 from modules.save_df_as_csv import save_df_as_csv
 from modules.save_report import save_report
 from modules.print_df_console import print_df_console
 from modules.parse_args import parse_args
+from modules.batch_driver import batch_driver
 
 
 """
@@ -32,7 +39,7 @@ Global variables:
 tracking_time = time.time()
 
 
-def process_path(logger: logging.Logger, args: argparse.Namespace) -> None:
+def process_path(logger: logging.Logger, args: argparse.Namespace) -> dict:
     """Order of execution of the algorithm major stages
 
     Args:
@@ -40,132 +47,370 @@ def process_path(logger: logging.Logger, args: argparse.Namespace) -> None:
         args: Namespace with the defined arguments and optional flags
 
     Returns:
-        None
+        Dictionary with a summary of the run, with it's outputs, number of lines and the time spent in each subpath
     """
 
-    #### Original log lines
-    log_lines = open_txt_file("../files/logs/wt{0}tcs.{1}.log".format(args.ut, args.date))
+    subpath_times = {}
+    mid_folder = args.outputfolder if args.outputfolder else "../files/mid_files"
+    log_arch_name = find_raw_file("../files/logs/wt{0}tcs.{1}.log".format(args.ut, args.date))
+
+    #### Subpath that fetches the observation file and builds it's time blocks, in the background while the log lines are read
+    obs_executor = ThreadPoolExecutor(max_workers=1)
+    obs_index_future = None
+
+    if args.obsprocess:
+        obs_index_future = obs_executor.submit(
+            obs_index_subpath,
+            logger=logger,
+            date=args.date,
+            fetch_obs_flag=args.fetchobs,
+            query_profile=args.queryprofile,
+            archive_url=args.archiveurl,
+            offline_flag=args.offline,
+            obs_max_age=args.obsmaxage,
+        )
 
     #### Subpath that generates the dataframes
-    df_list, mid_list = dataframe_generation_subpath(
-        logger=logger,
-        log_lines=log_lines,
-        date=args.date,
-        tplt_arch_flag=args.templatefile,
-        pre_process_flag=args.preprocess,
-        obs_process_flag=args.obsprocess,
-    )
+    subpath_start = time.time()
+
+    try:
+        df_list, mid_list, io_stats = dataframe_generation_subpath(
+            logger=logger,
+            log_arch_name=log_arch_name,
+            buffer_size=args.buffersize,
+            workers=args.workers,
+            date=args.date,
+            tplt_arch_flag=args.templatefile,
+            prefilter_flag=args.keywordfilter,
+            parser_engine=args.parser,
+            pre_process_flag=args.preprocess,
+            obs_index_future=obs_index_future,
+            mid_folder=mid_folder,
+        )
+
+    finally:
+        obs_executor.shutdown(wait=True, cancel_futures=True)
+
+    subpath_times["generation"] = time.time() - subpath_start
 
     #### Subpath that refines and stores the dataframes
-    refined_df_list = dataframe_refining_subpath(
+    subpath_start = time.time()
+
+    refined_df_list, drop_counts = dataframe_refining_subpath(
         logger=logger,
         df_list=df_list,
         img_linking=args.linkimages,
         df_linking=args.linkdataframes,
+        mid_folder=mid_folder,
     )
 
+    subpath_times["refining"] = time.time() - subpath_start
+    subpath_start = time.time()
+
     dataframe_showcasing_subpath(
         logger=logger,
-        log_file=log_lines,
         mid_files_list=mid_list,
         df_list=refined_df_list,
         console_flag=args.console,
         save_flag=args.save,
         report_flag=args.report,
+        report_folder=args.outputfolder if args.outputfolder else ".",
     )
 
-
-def dataframe_generation_subpath(
+    subpath_times["showcasing"] = time.time() - subpath_start
+
+    num_log_lines, num_pre_processed_lines, num_obs_lines, parsed_data = mid_list
+
+    return {
+        "date": args.date,
+        "ut": args.ut,
+        "log_file": log_arch_name,
+        "mid_folder": mid_folder,
+        "csv_folder": args.save,
+        "num_log_lines": num_log_lines,
+        "num_pre_processed_lines": num_pre_processed_lines,
+        "num_obs_lines": num_obs_lines,
+        "num_parsed_lines": len(parsed_data),
+        "num_rows": {
+            df_name: len(df)
+            for df_name, df in zip(["corrections", "f_dist", "images", "additional_data"], refined_df_list)
+        },
+        "num_dropped_rows": drop_counts,
+        "io": io_stats,
+        "times": subpath_times,
+    }
+
+
+def obs_index_subpath(
     logger: logging.Logger,
-    log_lines: list[str],
     date: str,
-    tplt_arch_flag: str,
-    pre_process_flag: bool,
-    obs_process_flag: bool,
-) -> list[list[any]]:
-    """Invokes the algorithm methods to pre-process the log lines, filter them by valid observations, parsed them and generate the 
-    respective dataframes
+    fetch_obs_flag: bool = True,
+    query_profile: str = "intervals",
+    archive_url: str = archive_url,
+    offline_flag: bool = False,
+    obs_max_age: float = cache_max_age,
+) -> ObsIntervalIndex:
+    """Invokes the algorithm methods to fetch the observation file of the night and build the time blocks of it's valid
+    observations. It's run in the background, from the start of the processing path, so the network time overlaps the reading of
+    the log lines
 
     Args:
         logger: Current script logging object
-        log_lines: List of the original log lines
         date: Date, in string format, of the night of the log file
-        tplt_arch_flag: Flag, and name if true, for the use of a customized template filename
-        pre_process_flag: Flag for the use of a pre-processing stage
-        obs_process_flag: Flag for the use of an observation filtering stage
+        fetch_obs_flag: Flag for the fetch of the observation file (if false, the one already in obs_files is used)
+        query_profile: Archive query profile of the observation file, either intervals (only the columns of the time blocks) or full
+        archive_url: Query URL of the archive the observation file is fetched from
+        offline_flag: Flag for the use of the cached observation file only, without any request to the archive
+        obs_max_age: Seconds that the cached observation file of a recent night is used before it's fetched again
 
     Returns:
-        List of lists, the first of generated dataframes and the second of the intermediate algorithm stages
+        Time blocks of the valid observations, by instrument (None if the night has no observations)
     """
 
-    #### Log lines pre-processing
-    pre_processed_logs = None
-
-    if pre_process_flag:
-        pre_processed_logs = log_formatting(logger, log_lines)
+    #### Observation time blocks
+    if fetch_obs_flag:
+        fetch_status, obs_list = fetch_obs_file(
+            logger,
+            "../files/obs_files",
+            date,
+            profile=query_profile,
+            url=archive_url,
+            max_age=obs_max_age,
+            offline=offline_flag,
+        )
 
-        # Save pre-processed logs to file
-        with open("../files/mid_files/pre_processed_logs.txt", "w", encoding="utf-8") as f:
-            for log_line in pre_processed_logs:
-                f.write("\t" + log_line)
+        # Neither the archive nor the cache have the file (as in an offline cache miss, with status 504), so none was written
+        if obs_list is None:
+            logger.info("No observation file fetched: {0} - Status: {1}".format(date, str(fetch_status)))
+            obs_list = []
 
+    # The observation file already in obs_files is used if it's not fetched
     else:
-        pre_processed_logs = log_lines
+        obs_file_name = "../files/obs_files/{0}.csv".format(date)
 
-        # Save pre-processed logs to file
-        with open("../files/mid_files/pre_processed_logs.txt", "w", encoding="utf-8") as f:
-            for log_line in pre_processed_logs:
-                f.write("\t" + log_line)
+        try:
+            obs_list = open_obs_file(logger, obs_file_name)
 
-    #### Log lines' observation filtering
-    obs_logs = pre_processed_logs
+        except OSError as error:
+            logger.info("Observation file not readable: {0} - {1}".format(obs_file_name, error))
+            obs_list = []
 
-    if obs_process_flag:
-        fetch_obs_file("../files/obs_files", date)
-        obs_list = open_obs_file("../files/obs_files/{0}.csv".format(date))
-        obs_logs = obs_filtering(logger, pre_processed_logs, obs_list, date)
+    # A night without observations (or without a readable observation file) is processed without the observation filtering
+    if len(obs_list) == 0:
+        logger.info("No observations for the night, observation filtering skipped: {0}".format(date))
+        print("No observations for the night, observation filtering skipped ", date)
 
-        # Save observation logs to file
-        with open("../files/mid_files/observation_logs.txt", "w") as f:
-            for obs_section_key in obs_logs.keys().__iter__():
-                f.write("\t" + obs_section_key + "\t")
-                for obs_line in obs_logs[obs_section_key]:
-                    f.write("\t\t" + obs_line)
+        return None
 
-    #### Log lines parsing
+    obs_index = ObsIntervalIndex.from_obs_list(obs_list)
 
+    return obs_index
+
+
+def dataframe_generation_subpath(
+    logger: logging.Logger,
+    log_arch_name: str,
+    buffer_size: int,
+    workers: int,
+    date: str,
+    tplt_arch_flag: str,
+    prefilter_flag: bool,
+    parser_engine: str,
+    pre_process_flag: bool,
+    obs_index_future: Future = None,
+    mid_folder: str = "../files/mid_files",
+) -> list[list[any]]:
+    """Invokes the algorithm methods to pre-process the log lines, filter them by valid observations, parsed them and generate the 
+    respective dataframes. The log lines go through the stages one chunk at a time, so the whole log file is never held in memory, and
+    the shards of the log file go through them in parallel when there is more than one worker
+
+    Args:
+        logger: Current script logging object
+        log_arch_name: Log file relative path, read lazily in chunks of raw bytes
+        buffer_size: Approximate size, in bytes, of each chunk of the log file
+        workers: Number of worker processes, each one processing a shard of the log file (the whole file is processed in this
+            process if it's 1)
+        date: Date, in string format, of the night of the log file
+        tplt_arch_flag: Flag, and name if true, for the use of a customized template filename
+        prefilter_flag: Flag for the use of a keyword prefiltering stage
+        parser_engine: Log line parsing engine, either regex (line by line) or batch (vectorized by template)
+        pre_process_flag: Flag for the use of a pre-processing stage
+        obs_index_future: Future of the observation time blocks, built in the background (no observation filtering stage if None).
+            The log lines are read and pre-processed while it's pending, in each worker, and only the filtering stage waits for it
+        mid_folder: Relative path of the folder where the intermediate files are written
+
+    Returns:
+        List with the list of generated dataframes, the list of the intermediate algorithm stages and a dictionary with the size
+        of the log file, the bytes read from it (after decompression), the streaming throughput and the peak disk use of the
+        intermediate files
+    """
+
+    #### Parsing templates
     log_parsing = True
-    parsed_data = None
+    parsed_data = []
     tplt_arch_name = "../files/templates/poc_templates"
 
     if tplt_arch_flag:
         tplt_arch_name = tplt_arch_flag
 
-    if log_parsing:
-        tplt_list = open_txt_file("{0}.txt".format(tplt_arch_name))
-        parsed_data = log_parsing_regex(logger, obs_logs, tplt_list)
+    # The declarative templates are preferred over the positional ones when both files exist
+    if not tplt_arch_name.endswith((".toml", ".txt")):
+        if os.path.exists("{0}.toml".format(tplt_arch_name)):
+            tplt_arch_name = "{0}.toml".format(tplt_arch_name)
+
+        else:
+            tplt_arch_name = "{0}.txt".format(tplt_arch_name)
+
+    template_registry = TemplateRegistry.load(tplt_arch_name)
+
+    # Keywords that a log line must contain to reach any template (or the AG.GUIDE sectioning), compiled once for every chunk
+    keyword_re = None
+
+    if prefilter_flag:
+        keyword_re = keywords_pattern(template_keywords(template_registry.keywords, extra_keywords=("AG.GUIDE",)))
+
+    #### Streaming of the log lines through the pre-processing, filtering and parsing stages, one shard of the log file by worker
+    pre_file_name = "{0}/pre_processed_logs.txt".format(mid_folder)
+    obs_file_name = "{0}/observation_logs.txt".format(mid_folder)
+
+    byte_ranges = shard_raw_file(log_arch_name, workers)
+    shard_results = []
+
+    stream_start = time.time()
+    join_peak_disk_use = 0
+
+    if log_parsing and len(byte_ranges) <= 1:
+        shard_results.append(
+            process_log_shard(
+                logger,
+                log_arch_name,
+                byte_ranges[0] if len(byte_ranges) == 1 else (0, 0),
+                buffer_size,
+                date,
+                keyword_re,
+                template_registry,
+                pre_process_flag,
+                obs_index_future,
+                parser_engine,
+                pre_file_name,
+                obs_file_name,
+            )
+        )
+
+    elif log_parsing:
+        # Each worker writes it's own part of the mid files, which are joined in the order of the shards
+        part_file_names = [
+            ("{0}.part{1}".format(pre_file_name, shard_number), "{0}.part{1}".format(obs_file_name, shard_number))
+            for shard_number in range(len(byte_ranges))
+        ]
+
+        # The pending time blocks are shared with the worker processes through a manager, so the shards are read meanwhile
+        with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as executor:
+            obs_index = SharedFuture(manager, obs_index_future) if obs_index_future is not None else None
+
+            shard_futures = [
+                executor.submit(
+                    process_log_shard,
+                    logger,
+                    log_arch_name,
+                    byte_range,
+                    buffer_size,
+                    date,
+                    keyword_re,
+                    template_registry,
+                    pre_process_flag,
+                    obs_index,
+                    parser_engine,
+                    pre_part_name,
+                    obs_part_name,
+                )
+                for byte_range, (pre_part_name, obs_part_name) in zip(byte_ranges, part_file_names)
+            ]
+
+            shard_results = [shard_future.result() for shard_future in shard_futures]
+
+        # The parts and the joined mid files are on disk at the same time while they are joined
+        parts_disk_use = sum(os.path.getsize(part_name) for part_names in part_file_names for part_name in part_names)
+        joined_disk_use = 0
+
+        with open(pre_file_name, "wb") as pre_file, open(obs_file_name, "wb") as obs_file:
+            for pre_part_name, obs_part_name in part_file_names:
+                for mid_file, part_name in [(pre_file, pre_part_name), (obs_file, obs_part_name)]:
+                    with open(part_name, "rb") as part_file:
+                        shutil.copyfileobj(part_file, mid_file)
+
+                    joined_disk_use += os.path.getsize(part_name)
+                    join_peak_disk_use = max(join_peak_disk_use, parts_disk_use + joined_disk_use)
+
+                    parts_disk_use -= os.path.getsize(part_name)
+                    os.remove(part_name)
+
+    num_log_lines = sum(shard_result[0] for shard_result in shard_results)
+    num_pre_processed_lines = sum(shard_result[1] for shard_result in shard_results)
+    num_obs_lines = sum(shard_result[2] for shard_result in shard_results)
+    num_log_bytes = sum(shard_result[4] for shard_result in shard_results)
+
+    stream_time = time.time() - stream_start
+
+    if log_parsing and parser_engine == "batch":
+        parsed_frames = [shard_result[3] for shard_result in shard_results if len(shard_result[3]) > 0]
+        parsed_data = pd.concat(parsed_frames, ignore_index=True) if len(parsed_frames) > 0 else pd.DataFrame()
 
         # Save parsed data to file
-        with open("../files/mid_files/parsed_data.txt", "w") as f:
+        with open("{0}/parsed_data.txt".format(mid_folder), "w") as f:
+            for data_dict in parsed_records(parsed_data, template_registry):
+                parsed_values = json.dumps(data_dict, default=np.ndarray.tolist)
+                f.writelines(parsed_values + "\n")
+
+    elif log_parsing:
+        for shard_result in shard_results:
+            parsed_data.extend(shard_result[3])
+
+        # Save parsed data to file
+        with open("{0}/parsed_data.txt".format(mid_folder), "w") as f:
             for data_dict in parsed_data:
-                parsed_values = json.dumps(data_dict)
+                parsed_values = json.dumps(data_dict, default=np.ndarray.tolist)
                 f.writelines(parsed_values + "\n")
     else:
         parsed_data = []
 
         # Load from file
-        with open("../files/mid_files/parsed_data.txt") as f:
+        with open("{0}/parsed_data.txt".format(mid_folder)) as f:
             for data_dict in f.readlines():
                 print(data_dict.split("\t"))
                 parsed_data.append(data_dict.split("\t"))
 
+    #### Input and output figures, from the compressed (or plain) log file to the mid files
+    io_stats = {
+        "log_file_size": os.path.getsize(log_arch_name),
+        "log_bytes_read": num_log_bytes,
+        "throughput": num_log_bytes / max(stream_time, 1e-9),
+        "peak_disk_use": max(
+            join_peak_disk_use,
+            sum(
+                os.path.getsize(mid_file_name)
+                for mid_file_name in [pre_file_name, obs_file_name, "{0}/parsed_data.txt".format(mid_folder)]
+                if os.path.exists(mid_file_name)
+            ),
+        ),
+    }
+
+    logger.info(
+        "Log input: {0} bytes on disk - {1} bytes read - Throughput: {2} MB/s - Peak disk use: {3} bytes".format(
+            str(io_stats["log_file_size"]),
+            str(io_stats["log_bytes_read"]),
+            str(io_stats["throughput"] / 1e6),
+            str(io_stats["peak_disk_use"]),
+        )
+    )
+
     #### Parsed data classifier
     df_list = generate_dataframes(logger, parsed_data)
 
-    #### Mid files list
-    mid_files_list = [pre_processed_logs, obs_logs, parsed_data]
+    #### Mid files list, with the number of lines read and kept by the streamed stages
+    mid_files_list = [num_log_lines, num_pre_processed_lines, num_obs_lines, parsed_data]
 
-    return [df_list, mid_files_list]
+    return [df_list, mid_files_list, io_stats]
 
 
 def dataframe_refining_subpath(
@@ -173,7 +418,8 @@ def dataframe_refining_subpath(
     df_list: list[pd.DataFrame],
     img_linking: bool,
     df_linking: bool,
-) -> list[pd.DataFrame]:
+    mid_folder: str = "../files/mid_files",
+) -> list[any]:
     """Invokes the algorithm methods to validate the format of the dataframes for images, force distributions and correction instances,
     linkes the image dataframe with the respective fits files, and links the correction dataframe with the respective force distribution
     and image for each row. 
@@ -181,29 +427,25 @@ def dataframe_refining_subpath(
 
     Args:
         logger: Current script logging object
-        df_list: List of the previously generated dataframes
+        df_list: List of the previously generated dataframes, followed by the matrix of forces
         img_linking: Flag for the linking of the image dataframe with the respective fits file for each row
         df_linking: Flag for the linking of the correction dataframe with the respective force distribution and image for each row
+        mid_folder: Relative path of the folder where the index of fits headers is kept
 
     Returns:
-        List of the refined dataframes
+        List with the list of the refined dataframes, followed by the matrix of forces, and a dictionary with the number of rows
+        dropped by each validation rule
     """
 
     #### Denormalizing dataframe list
-    df_corrections, df_f_dist, df_images, df_additional_data = df_list
-
-    #### Validate successful images instances
-    df_images = validate_images(logger, df_images)
+    df_corrections, df_f_dist, df_images, df_additional_data, forces_matrix = df_list
 
-    #### Validate successful force distribution instances
-    df_f_dist = validate_forces(logger, df_f_dist, df_images)
+    #### Validate successful images, force distribution and correction instances
+    df_corrections, df_f_dist, df_images, drop_counts = validate_all(logger, df_corrections, df_f_dist, df_images)
 
     #### Linking df_images and fits files
     if img_linking:
-        df_images = link_images(logger, df_images, "img_files")
-
-    #### Validate successful correction instances
-    df_corrections = validate_corrections(logger, df_corrections, df_f_dist)
+        df_images = link_images(logger, df_images, "img_files", "{0}/fits_headers.sqlite".format(mid_folder))
 
     #### Link forces distributions and images with correction instances
     if df_linking:
@@ -215,31 +457,31 @@ def dataframe_refining_subpath(
         )
 
     #### Refined dataframe list
-    nu_df_list = [df_corrections, df_f_dist, df_images, df_additional_data]
+    nu_df_list = [df_corrections, df_f_dist, df_images, df_additional_data, forces_matrix]
 
-    return nu_df_list
+    return [nu_df_list, drop_counts]
 
 
 def dataframe_showcasing_subpath(
     logger: logging.Logger,
-    log_file: list[str],
-    mid_files_list: list[list[str]],
+    mid_files_list: list[any],
     df_list: list[pd.DataFrame],
     console_flag: bool,
     save_flag: str,
     report_flag: str,
+    report_folder: str = ".",
 ) -> None:
     """Invokes the algorithm methods to save the generated dataframes as a csv file, print on console or generate a report file to showcase
     the algorithm performance
 
     Args:
         logger: Current script logging object
-        log_file: List of the original log files
         mid_files_list: List of the intermediate algorithm stages results
-        df_list: List of the previously generated dataframes
+        df_list: List of the previously generated dataframes, followed by the matrix of forces
         console_flag: Flag for the use of the console stage
         save_flag: Flag for the use of the save as csv stage
         report_flag: Flag for the use of the report file stage
+        report_folder: Relative path of the folder where the report file is written
 
     Returns:
         None
@@ -257,9 +499,8 @@ def dataframe_showcasing_subpath(
     #### Print dataframes in console
     if report_flag:
         save_report(
-            log_file,
             mid_files_list,
-            "Reporte {0}".format(datetime.now().strftime("%Y-%m-%d_%H-%M-%S")),
+            "{0}/Reporte {1}".format(report_folder, datetime.now().strftime("%Y-%m-%d_%H-%M-%S")),
         )
 
 
@@ -275,8 +516,12 @@ def main(argv: list[str]):
     #### Arg parser
     args = parse_args(argv)
 
-    #### Processing path
-    process_path(logger, args)
+    #### Processing path, for a single night and UT, or for every night and UT of a batch
+    if args.enddate or "," in args.ut:
+        batch_driver(logger, args, process_path)
+
+    else:
+        process_path(logger, args)
 
     ### Final time
     print("Final time: ", str(time.time() - init_time))